@@ -0,0 +1,161 @@
+"""Keystroke analytics over recorded sessions (see keylog.py).
+
+The logs get concatenated into flat NumPy arrays and every statistic is a vectorized group-by
+(bincount) over them, so tens of millions of keys take seconds rather than minutes.
+
+    python analytics.py typy_keys.log
+"""
+import argparse
+import json
+import typing
+
+import numpy as np
+
+from engine import WRONG
+from keylog import BACKSPACE, CHAR, PAUSE_NS, SPACE, KeyLog, load_logs
+
+# chars/bigrams seen fewer times than this are left out of the tables
+MIN_SAMPLES = 5
+PERCENTILES = [10, 50, 90, 99]
+
+
+def concat_logs(logs: list[KeyLog]) -> dict:
+    """All of the keys of the logs as flat arrays, plus the index of the log each key comes from."""
+    logs = [log for log in logs if len(log)]
+    if not logs:
+        raise ValueError("no keys recorded")
+    # NOTE: frombuffer does not copy, the only copy is the concatenation
+    keys = dict(
+        times=np.concatenate([np.frombuffer(log.times, dtype=np.int64) for log in logs]),
+        kinds=np.concatenate([np.frombuffer(log.kinds, dtype=np.uint8) for log in logs]),
+        expected=np.concatenate([np.frombuffer(log.expected, dtype=np.uint32) for log in logs]),
+        status=np.concatenate([np.frombuffer(log.status, dtype=np.uint8) for log in logs]),
+    )
+    keys["session"] = np.repeat(np.arange(len(logs)), [len(log) for log in logs])
+    return keys
+
+
+def _key_table(codes: np.ndarray, size: int, errors: np.ndarray, intervals: np.ndarray, timed: np.ndarray, decode: typing.Callable) -> list[dict]:
+    """Count, error rate and mean interval per code (0 <= code < size), most error-prone first."""
+    if len(codes) == 0:
+        return list()
+    n = np.bincount(codes, minlength=size)
+    n_errors = np.bincount(codes, weights=errors, minlength=size)
+    n_timed = np.bincount(codes, weights=timed, minlength=size)
+    latency = np.bincount(codes, weights=intervals * timed, minlength=size)
+    table = list()
+    for i in np.flatnonzero(n >= MIN_SAMPLES):
+        table.append(dict(
+            key=decode(int(i)),
+            n=int(n[i]),
+            error_pct=round(100.0 * n_errors[i] / n[i], 1),
+            latency_ms=round(latency[i] / n_timed[i] / 1e6, 1) if n_timed[i] else None,
+        ))
+    table.sort(key=lambda row: (-row["error_pct"], -(row["latency_ms"] or 0)))
+    return table
+
+
+def analyze(logs: list[KeyLog]) -> dict:
+    keys = concat_logs(logs)
+    times, kinds, expected, session = keys["times"], keys["kinds"], keys["expected"], keys["session"]
+    n_sessions = int(session[-1]) + 1
+    session_start = np.ones(len(times), dtype=bool)
+    session_start[1:] = session[1:] != session[:-1]
+
+    # time since the previous key; the first key of a session and breaks do not count
+    intervals = np.diff(times, prepend=times[0]).astype(np.float64)
+    timed = ~session_start & (intervals <= PAUSE_NS)
+
+    # per char and per bigram (of letters typed against a letter of the text)
+    typed = (kinds == CHAR) & (expected != 0)
+    errors = (keys["status"] == WRONG).astype(np.float64)
+    # NOTE: the letters get dense ids so that the bigrams fit a small bincount too (no sorting)
+    letters = np.flatnonzero(np.bincount(expected))
+    letter_ids = np.zeros(int(letters[-1]) + 1, dtype=np.int64)
+    letter_ids[letters] = np.arange(len(letters))
+    ids = letter_ids[expected]
+    k = len(letters)
+    chars = _key_table(ids[typed], k, errors[typed], intervals[typed], timed[typed], lambda i: chr(letters[i]))
+    pairs = typed[1:] & typed[:-1] & ~session_start[1:]
+    bigrams = _key_table(
+        (ids[:-1] * k + ids[1:])[pairs], k * k, errors[1:][pairs], intervals[1:][pairs], timed[1:][pairs],
+        lambda i: chr(letters[i // k]) + chr(letters[i % k]),
+    )
+
+    # burst wpm: the speed of every single word, from the space before it to the space after it
+    is_space = kinds == SPACE
+    net_chars = (kinds == CHAR).astype(np.int64) - (kinds == BACKSPACE)
+    word_start = session_start.copy()
+    word_start[1:] |= is_space[:-1]
+    word = np.cumsum(word_start) - 1
+    starts = np.flatnonzero(word_start)
+    ends = np.r_[starts[1:], len(times)] - 1
+    word_chars = np.bincount(word, weights=net_chars)
+    begin = np.where(session_start[starts], times[starts], times[np.maximum(starts - 1, 0)])
+    duration = (times[ends] - begin) / 60e9
+    complete = is_space[ends] & (word_chars > 0) & (duration > 0)
+    burst_wpm = (word_chars[complete] + 1) / 5 / duration[complete]
+
+    # consistency: how even the rhythm is within a session (100% - coefficient of variation)
+    n_timed = np.bincount(session, weights=timed, minlength=n_sessions)
+    total = np.bincount(session, weights=intervals * timed, minlength=n_sessions)
+    total_sq = np.bincount(session, weights=intervals**2 * timed, minlength=n_sessions)
+    # NOTE: a paste gets logged with a single timestamp, a session of nothing but that has no rhythm
+    has_timed = (n_timed > 1) & (total > 0)
+    mean = total[has_timed] / n_timed[has_timed]
+    std = np.sqrt(np.maximum(total_sq[has_timed] / n_timed[has_timed] - mean**2, 0))
+    consistency = np.clip(100 * (1 - std / mean), 0, 100) if len(mean) else np.zeros(0)
+
+    timed_intervals = intervals[timed] / 1e6
+    return dict(
+        n_sessions=n_sessions,
+        n_keys=len(times),
+        interval_ms={f"p{p}": round(float(v), 1) for p, v in zip(PERCENTILES, np.percentile(timed_intervals, PERCENTILES))} if len(timed_intervals) else dict(),
+        consistency_pct=round(float(consistency.mean()), 1) if len(consistency) else None,
+        burst_wpm=dict(p50=round(float(np.median(burst_wpm))), max=round(float(burst_wpm.max()))) if len(burst_wpm) else dict(),
+        chars=chars,
+        bigrams=bigrams,
+    )
+
+
+def summary_lines(report: dict, top: int = 2) -> list[str]:
+    """A few short lines of the report (for the game over screen)."""
+    lines = list()
+    if report["consistency_pct"] is not None:
+        lines.append(f"consistency: {report['consistency_pct']:g}%")
+    if report["burst_wpm"]:
+        lines.append(f"burst wpm: {report['burst_wpm']['p50']} (max {report['burst_wpm']['max']})")
+    if any(report["interval_ms"].values()):
+        lines.append(f"key gap: {report['interval_ms']['p50']:.0f}ms (p90 {report['interval_ms']['p90']:.0f})")
+    worst = [row for row in report["chars"] if row["error_pct"] > 0][:top]
+    if worst:
+        lines.append("missed: " + " ".join(f"{row['key']} {row['error_pct']:.0f}%" for row in worst))
+    slowest = sorted((row for row in report["bigrams"] if row["latency_ms"] is not None), key=lambda row: -row["latency_ms"])[:top]
+    if slowest:
+        lines.append("slow: " + " ".join(f"{row['key']} {row['latency_ms']:.0f}ms" for row in slowest))
+    return lines
+
+
+def print_report(report: dict, top: int) -> None:
+    print(f"{report['n_sessions']} sessions, {report['n_keys']} keys")
+    print("key interval (ms): " + ", ".join(f"{p} {v:g}" for p, v in report["interval_ms"].items()))
+    print(f"consistency: {report['consistency_pct']}%")
+    print(f"burst wpm: median {report['burst_wpm'].get('p50')}, max {report['burst_wpm'].get('max')}")
+    for name in ("chars", "bigrams"):
+        print(f"\n{name} (most missed first)")
+        print(f"{'key':<6}{'n':>8}{'error %':>10}{'latency ms':>12}")
+        for row in report[name][:top]:
+            print(f"{row['key']!r:<6}{row['n']:>8}{row['error_pct']:>10g}{row['latency_ms'] if row['latency_ms'] is not None else '-':>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog='TyPy analytics', description='Per-key and per-bigram stats of recorded sessions')
+    parser.add_argument('logs', help="Keystroke logs written by main.py --record", nargs='+')
+    parser.add_argument('-k', '--top', help="Rows per table", default=10, type=int)
+    parser.add_argument('--json', help="Print the full report as JSON", action='store_true')
+    args = parser.parse_args()
+    report = analyze([log for path in args.logs for log in load_logs(path)])
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, args.top)
@@ -0,0 +1,151 @@
+"""Keystroke latency benchmark.
+
+Replays synthetic keystroke streams through the full input path of the app (input field change
+signal -> typing session -> word box -> render of the whole screen) against an offscreen screen and
+reports the per-keystroke latency and allocation percentiles as JSON.
+
+    python bench.py -o bench_output.json
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import typing
+
+import urwid
+
+from main import build_app
+
+SCENARIOS = ["correct", "errors", "backspace_storm", "double_space"]
+WORD_COUNTS = [10, 50, 1000, 10000]
+
+
+class OffscreenScreen(urwid.BaseScreen):
+    """Screen stand-in that composes the canvas like a real screen would but writes it nowhere."""
+    def __init__(self, size: tuple[int, int]) -> None:
+        super().__init__()
+        self.size = size
+        self.rows = list()
+
+    def get_cols_rows(self) -> tuple[int, int]:
+        return self.size
+
+    def draw_screen(self, size: tuple[int, int], canvas: urwid.Canvas) -> None:
+        self.rows = list(canvas.content())
+
+    def clear(self) -> None:
+        pass
+
+
+def scenario_keys(scenario: str, word: str, rng: random.Random) -> list[str]:
+    """Keys to type one word (followed by a space) in the given scenario."""
+    keys = list(word)
+    if scenario == "errors":
+        if rng.random() < 0.2:
+            # typo that gets corrected right away
+            pos = rng.randrange(len(word))
+            keys = list(word[:pos]) + [rng.choice("qxz"), "backspace"] + list(word[pos:])
+        elif rng.random() < 0.1:
+            # typo that does not
+            pos = rng.randrange(len(word))
+            keys[pos] = rng.choice("qxz")
+    elif scenario == "backspace_storm":
+        junk = rng.randint(3, 8)
+        keys = [rng.choice("asdf") for _ in range(junk)] + ["backspace"]*(junk + 2) + keys
+    elif scenario == "double_space":
+        keys += [" "]
+    return keys + [" "]
+
+
+def run_scenario(scenario: str, num_words: int, num_keys: int, visible_lines: typing.Optional[int], size: tuple[int, int], trace: bool) -> list[float]:
+    """Press `num_keys` keys and return the per-key latencies (or allocation peaks if `trace`)."""
+    random.seed(0)
+    rng = random.Random(1)
+    screen = OffscreenScreen(size)
+    app = build_app(num_words, visible_lines, screen=screen)
+    loop = app["loop"]
+    launcher = app["word_widget_with_popup"]
+    loop.draw_screen()
+
+    samples = list()
+    while len(samples) < num_keys:
+        state = app["word_widget"].state
+        for key in scenario_keys(scenario, state.word(state.word_idx), rng):
+            if trace:
+                tracemalloc.reset_peak()
+                before, _ = tracemalloc.get_traced_memory()
+                loop.process_input([key])
+                loop.draw_screen()
+                _, peak = tracemalloc.get_traced_memory()
+                samples.append(peak - before)
+            else:
+                t = time.perf_counter()
+                loop.process_input([key])
+                loop.draw_screen()
+                samples.append(time.perf_counter() - t)
+            if launcher._pop_up_widget is not None:
+                # game over -> hit retry (not measured) and go on with the new round
+                loop.process_input(["enter"])
+                loop.draw_screen()
+                break
+    return samples[:num_keys]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def main(word_counts: list[int], scenarios: list[str], num_keys: int, visible_lines: typing.Optional[int], size: tuple[int, int]) -> dict:
+    results = list()
+    for num_words in word_counts:
+        for scenario in scenarios:
+            latencies = run_scenario(scenario, num_words, num_keys, visible_lines, size, trace=False)
+            tracemalloc.start()
+            allocs = run_scenario(scenario, num_words, num_keys, visible_lines, size, trace=True)
+            tracemalloc.stop()
+            results.append(dict(
+                scenario=scenario,
+                num_words=num_words,
+                keystrokes=len(latencies),
+                p50_us=round(percentile(latencies, 50) * 1e6, 1),
+                p99_us=round(percentile(latencies, 99) * 1e6, 1),
+                max_us=round(max(latencies) * 1e6, 1),
+                alloc_p50_bytes=percentile(allocs, 50),
+                alloc_p99_bytes=percentile(allocs, 99),
+            ))
+            print(f"{scenario:>16} {num_words:>6} words: p50 {results[-1]['p50_us']}us p99 {results[-1]['p99_us']}us", file=sys.stderr)
+    return dict(
+        python=platform.python_version(),
+        urwid=urwid.__version__,
+        screen=list(size),
+        visible_lines=visible_lines,
+        results=results,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog='TyPy bench', description='Keystroke latency benchmark')
+    parser.add_argument('-o', '--output', help="Write the JSON report here instead of stdout")
+    parser.add_argument('-k', '--keys', help="Keystrokes per scenario", default=2000, type=int)
+    parser.add_argument('-w', '--words', help="Comma separated word counts", default=",".join(map(str, WORD_COUNTS)))
+    parser.add_argument('-s', '--scenarios', help="Comma separated scenarios", default=",".join(SCENARIOS))
+    parser.add_argument('-l', '--lines', help="Number of word box lines to show (0 shows all of them)", default=3, type=int)
+    parser.add_argument('--size', help="Screen size as COLSxROWS", default="80x24")
+    args = parser.parse_args()
+    cols, rows = map(int, args.size.split("x"))
+    report = main(
+        [int(n) for n in args.words.split(",")],
+        args.scenarios.split(","),
+        args.keys,
+        args.lines or None,
+        (cols, rows),
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
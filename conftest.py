@@ -0,0 +1,43 @@
+import random
+
+import pytest
+
+WORDS = ["the", "quick", "brown", "fox", "jumps", "over", "a", "lazy", "dog", "typewriter"]
+
+
+@pytest.fixture
+def random_words():
+    """random_words(rng, n): n words drawn from a small vocabulary."""
+    def random_words(rng: random.Random, n: int) -> list[str]:
+        return [rng.choice(WORDS) for _ in range(n)]
+    return random_words
+
+
+@pytest.fixture
+def random_keys():
+    """random_keys(rng, words, n): up to n keys typing through the words ("\\b" is a backspace).
+
+    Mostly correct typing, with typos, backspaces and early and double spaces.
+    """
+    def random_keys(rng: random.Random, words: list[str], n: int) -> str:
+        keys = list()
+        word_idx, char_idx = 0, 0
+        while len(keys) < n and word_idx < len(words):
+            word = words[word_idx]
+            r = rng.random()
+            if r < 0.1:
+                keys.append("\b")
+                char_idx = max(0, char_idx - 1)
+            elif r < 0.2:
+                keys.append(rng.choice("xyz"))
+                char_idx += 1
+            elif r < 0.25 or char_idx >= len(word):
+                keys.append(" ")
+                if char_idx:
+                    word_idx += 1
+                    char_idx = 0
+            else:
+                keys.append(word[char_idx])
+                char_idx += 1
+        return "".join(keys)
+    return random_keys
@@ -0,0 +1,154 @@
+"""Word corpora loaded from frequency-ranked word lists.
+
+The word list file is memory-mapped and indexed once (word offsets plus an alias table for the
+weighted sampling); the index is cached in ~/.cache/typy so that the next start only has to read it
+back.
+"""
+import mmap
+import os
+import random
+import struct
+import typing
+from array import array
+from hashlib import sha1
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "typy")
+CACHE_MAGIC = b"TYPYIDX1"
+# source file size, source file mtime (ns), number of words
+CACHE_HEADER = struct.Struct("<QQQ")
+MAX_WORD_LEN = 255
+
+
+def build_alias_table(weights: array) -> tuple[array, array]:
+    """Vose's alias method: after O(n) setup every weighted draw is O(1)."""
+    n = len(weights)
+    total = sum(weights)
+    prob = array("d", [w * n / total for w in weights])
+    alias = array("I", range(n))
+    small = [i for i in range(n) if prob[i] < 1.0]
+    large = [i for i in range(n) if prob[i] >= 1.0]
+    while small and large:
+        s = small.pop()
+        l = large.pop()
+        alias[s] = l
+        prob[l] -= 1.0 - prob[s]
+        if prob[l] < 1.0:
+            small.append(l)
+        else:
+            large.append(l)
+    # NOTE: whatever is left is 1 up to rounding errors
+    for i in small + large:
+        prob[i] = 1.0
+    return prob, alias
+
+
+class Corpus:
+    """Memory-mapped word list, one word per line, most frequent words first.
+
+    A line can carry the word count after the word (`word 1234`); in a file without counts the
+    words get a Zipf weight from their rank (1/rank). Counts are all or nothing (the two are not on
+    the same scale) and words counted 0 never get drawn, so they are left out.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = os.path.abspath(path)
+        with open(self.path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise ValueError(f"no words found in {path}")
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        stat = os.stat(self.path)
+        self._source_key = (stat.st_size, stat.st_mtime_ns)
+        cache_name = sha1(self.path.encode()).hexdigest() + ".idx"
+        self.cache_path = os.path.join(CACHE_DIR, cache_name)
+        if not self._load_index():
+            self._build_index()
+            self._save_index()
+        if len(self.starts) == 0:
+            raise ValueError(f"no words found in {path}")
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def _build_index(self) -> None:
+        self.starts = array("Q")
+        self.lengths = array("B")
+        weights = array("d")
+        has_counts = None
+        mm = self._mm
+        pos = 0
+        size = len(mm)
+        while pos < size:
+            end = mm.find(b"\n", pos)
+            if end == -1:
+                end = size
+            line = mm[pos:end]
+            fields = line.split()
+            if fields:
+                word = fields[0]
+                counted = len(fields) > 1 and fields[1].isdigit()
+                if has_counts is None:
+                    has_counts = counted
+                elif counted != has_counts:
+                    raise ValueError(f"{self.path}: either every word or none of them should have a count")
+                if counted:
+                    weight = float(fields[1])
+                else:
+                    weight = 1.0 / (len(self.starts) + 1)
+                if weight > 0:
+                    self.starts.append(pos + line.index(word))
+                    self.lengths.append(min(len(word), MAX_WORD_LEN))
+                    weights.append(weight)
+            pos = end + 1
+        if len(self.starts):
+            self.prob, self.alias = build_alias_table(weights)
+
+    def _load_index(self) -> bool:
+        try:
+            with open(self.cache_path, "rb") as f:
+                if f.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+                    return False
+                size, mtime_ns, n = CACHE_HEADER.unpack(f.read(CACHE_HEADER.size))
+                if (size, mtime_ns) != self._source_key:
+                    # the word list changed since it got indexed
+                    return False
+                self.starts = array("Q")
+                self.starts.fromfile(f, n)
+                self.lengths = array("B")
+                self.lengths.fromfile(f, n)
+                self.prob = array("d")
+                self.prob.fromfile(f, n)
+                self.alias = array("I")
+                self.alias.fromfile(f, n)
+        except (OSError, EOFError, struct.error):
+            return False
+        return True
+
+    def _save_index(self) -> None:
+        if len(self.starts) == 0:
+            return
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(CACHE_MAGIC)
+                f.write(CACHE_HEADER.pack(*self._source_key, len(self.starts)))
+                self.starts.tofile(f)
+                self.lengths.tofile(f)
+                self.prob.tofile(f)
+                self.alias.tofile(f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            # NOTE: not being able to cache the index only makes the next start slower
+            pass
+
+    def word(self, idx: int) -> str:
+        start = self.starts[idx]
+        return self._mm[start:start + self.lengths[idx]].decode(errors="replace")
+
+    def sample_index(self, rng: random.Random = random) -> int:
+        i = int(rng.random() * len(self.starts))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+    def words(self, rng: random.Random = random) -> typing.Iterator[str]:
+        """Endless stream of words drawn according to their weights."""
+        while True:
+            yield self.word(self.sample_index(rng))
@@ -0,0 +1,66 @@
+"""Practice texts streamed from documents on disk.
+
+The document is memory-mapped and tokenized lazily, one whitespace separated word at a time, so
+even a book never gets read into memory as a whole. Positions in the document are byte offsets;
+the offset where the user stopped typing is kept in a small JSON file to resume from next time.
+"""
+import json
+import mmap
+import os
+import re
+import typing
+
+DATA_DIR = os.path.join(os.path.expanduser("~"), ".local", "share", "typy")
+RESUME_PATH = os.path.join(DATA_DIR, "resume.json")
+WORD_RE = re.compile(rb"\S+")
+
+
+class Document:
+    def __init__(self, path: str) -> None:
+        self.path = os.path.abspath(path)
+        with open(self.path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise ValueError(f"{path} is empty")
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if WORD_RE.search(self._mm) is None:
+            raise ValueError(f"no words found in {path}")
+
+    def iter_words(self, start: int = 0) -> typing.Iterator[tuple[str, int]]:
+        """Yield (word, byte offset right after the word) from `start` on, wrapping at the end."""
+        while True:
+            for match in WORD_RE.finditer(self._mm, start):
+                yield match.group().decode(errors="replace"), match.end()
+            start = 0
+
+    def words(self, start: int = 0) -> typing.Iterator[str]:
+        for word, _ in self.iter_words(start):
+            yield word
+
+    def skip_words(self, start: int, n: int) -> int:
+        """Byte offset right after the n-th word from `start`."""
+        offset = start
+        for _, (_, offset) in zip(range(n), self.iter_words(start)):
+            pass
+        return offset
+
+
+def load_resume_offset(path: str) -> int:
+    try:
+        with open(RESUME_PATH) as f:
+            return int(json.load(f).get(os.path.abspath(path), 0))
+    except (OSError, ValueError):
+        return 0
+
+
+def save_resume_offset(path: str, offset: int) -> None:
+    try:
+        with open(RESUME_PATH) as f:
+            offsets = json.load(f)
+    except (OSError, ValueError):
+        offsets = dict()
+    offsets[os.path.abspath(path)] = offset
+    os.makedirs(DATA_DIR, exist_ok=True)
+    tmp_path = RESUME_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(offsets, f)
+    os.replace(tmp_path, RESUME_PATH)
@@ -0,0 +1,202 @@
+"""Adaptive drill: words picked for the letters and bigrams the user struggles with.
+
+An inverted index maps every letter and bigram to the words containing it; for a corpus it gets built
+once for its most frequent words and cached in ~/.cache/typy next to the corpus index. Every letter
+and bigram has a weight, a moving average of how badly it went (error rate, slowness) in the recent
+rounds. After a round only the weights of what got typed in it are updated; drawing a word then
+takes a weighted pick of a letter/bigram plus a random pick from its words.
+"""
+import json
+import os
+import random
+import struct
+import typing
+from array import array
+from bisect import bisect_right
+from hashlib import sha1
+from itertools import accumulate
+
+from corpus import CACHE_DIR, Corpus
+from document import DATA_DIR
+from engine import WRONG
+from keylog import CHAR, PAUSE_NS, KeyLog
+
+WEIGHTS_PATH = os.path.join(DATA_DIR, "drill.json")
+INDEX_MAGIC = b"TYPYNGR1"
+# source file size, source file mtime (ns), number of words, number of ngrams, number of postings
+INDEX_HEADER = struct.Struct("<QQQQQ")
+# only the most frequent words of a corpus get indexed
+MAX_WORDS = 20000
+# share of the words drawn for the weak letters/bigrams (the rest comes from the usual word source)
+FOCUS_SHARE = 0.6
+# how much a round moves the weights
+ALPHA = 0.3
+# how much being slow counts next to the error rate (per "twice as slow as usual")
+LATENCY_WEIGHT = 0.5
+
+
+def ngrams(word: str) -> set[str]:
+    return set(word) | {word[i:i + 2] for i in range(len(word) - 1)}
+
+
+class NgramIndex:
+    """Letter/bigram -> ids of the words containing it, as slices of one flat postings array."""
+    def __init__(self, word: typing.Callable[[int], str], num_words: int) -> None:
+        self.word = word
+        self.num_words = num_words
+        self.grams = list()
+        self.starts = array("Q", [0])
+        self.postings = array("I")
+
+    @classmethod
+    def build(cls, word: typing.Callable[[int], str], num_words: int) -> "NgramIndex":
+        index = cls(word, num_words)
+        postings = dict()
+        for i in range(num_words):
+            for gram in ngrams(word(i)):
+                postings.setdefault(gram, array("I")).append(i)
+        for gram, ids in postings.items():
+            index.grams.append(gram)
+            index.postings.extend(ids)
+            index.starts.append(len(index.postings))
+        index._index_grams()
+        return index
+
+    @classmethod
+    def for_corpus(cls, corpus: Corpus) -> "NgramIndex":
+        num_words = min(len(corpus), MAX_WORDS)
+        cache_path = os.path.join(CACHE_DIR, sha1(corpus.path.encode()).hexdigest() + ".ngrams")
+        stat = os.stat(corpus.path)
+        key = (stat.st_size, stat.st_mtime_ns, num_words)
+        index = cls(corpus.word, num_words)
+        if index._load(cache_path, key):
+            return index
+        index = cls.build(corpus.word, num_words)
+        index._save(cache_path, key)
+        return index
+
+    def _index_grams(self) -> None:
+        self.gram_ids = {gram: i for i, gram in enumerate(self.grams)}
+
+    def _load(self, path: str, key: tuple) -> bool:
+        try:
+            with open(path, "rb") as f:
+                if f.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+                    return False
+                size, mtime_ns, num_words, num_grams, num_postings = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+                if (size, mtime_ns, num_words) != key:
+                    return False
+                self.starts = array("Q")
+                self.starts.fromfile(f, num_grams + 1)
+                self.postings = array("I")
+                self.postings.fromfile(f, num_postings)
+                self.grams = f.read().decode().split("\n")
+        except (OSError, EOFError, struct.error, UnicodeDecodeError):
+            return False
+        if len(self.grams) != num_grams:
+            return False
+        self._index_grams()
+        return True
+
+    def _save(self, path: str, key: tuple) -> None:
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(INDEX_MAGIC)
+                f.write(INDEX_HEADER.pack(*key, len(self.grams), len(self.postings)))
+                self.starts.tofile(f)
+                self.postings.tofile(f)
+                # NOTE: words are whitespace free, so are their ngrams
+                f.write("\n".join(self.grams).encode())
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def sample(self, gram: str, rng: random.Random = random) -> str:
+        i = self.gram_ids[gram]
+        start, end = self.starts[i], self.starts[i + 1]
+        return self.word(self.postings[start + int(rng.random() * (end - start))])
+
+
+def round_scores(log: KeyLog) -> dict:
+    """How badly every letter/bigram typed in the round went: error rate plus a slowness penalty."""
+    counts = dict()
+    prev_letter = None
+    prev_time = None
+    total_latency = 0
+    n_timed = 0
+    for t, kind, expected, status in zip(log.times, log.kinds, log.expected, log.status):
+        if kind != CHAR or expected == 0:
+            prev_letter = None
+            prev_time = t
+            continue
+        letter = chr(expected)
+        latency = t - prev_time if prev_time is not None and t - prev_time <= PAUSE_NS else None
+        grams = [letter, prev_letter + letter] if prev_letter is not None else [letter]
+        for gram in grams:
+            gram_counts = counts.get(gram)
+            if gram_counts is None:
+                # [keys, errors, total latency, timed keys]
+                gram_counts = counts[gram] = [0, 0, 0, 0]
+            gram_counts[0] += 1
+            gram_counts[1] += status == WRONG
+            if latency is not None:
+                gram_counts[2] += latency
+                gram_counts[3] += 1
+        if latency is not None:
+            total_latency += latency
+            n_timed += 1
+        prev_letter = letter
+        prev_time = t
+    mean_latency = total_latency / n_timed if n_timed else 0
+    scores = dict()
+    for gram, (n, n_errors, latency, timed) in counts.items():
+        score = n_errors / n
+        if timed and mean_latency:
+            score += LATENCY_WEIGHT * max(0.0, latency / timed / mean_latency - 1)
+        scores[gram] = score
+    return scores
+
+
+class Drill:
+    def __init__(self, index: NgramIndex, base_words: typing.Iterator[str], weights: typing.Optional[dict] = None) -> None:
+        self.index = index
+        self.base_words = base_words
+        self.weights = dict(weights or dict())
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        # NOTE: only the letters/bigrams the index knows can be drilled
+        self._grams = [gram for gram, w in self.weights.items() if w > 0 and gram in self.index.gram_ids]
+        self._cum_weights = list(accumulate(self.weights[gram] for gram in self._grams))
+
+    def update(self, log: KeyLog) -> None:
+        """Move the weights of the letters/bigrams typed in the round towards how they went."""
+        for gram, score in round_scores(log).items():
+            self.weights[gram] = (1 - ALPHA) * self.weights.get(gram, 0.0) + ALPHA * score
+        self._rebuild()
+
+    def words(self, rng: random.Random = random) -> typing.Iterator[str]:
+        while True:
+            if self._grams and rng.random() < FOCUS_SHARE:
+                i = bisect_right(self._cum_weights, rng.random() * self._cum_weights[-1])
+                yield self.index.sample(self._grams[min(i, len(self._grams) - 1)], rng)
+            else:
+                yield next(self.base_words)
+
+
+def load_weights() -> dict:
+    try:
+        with open(WEIGHTS_PATH) as f:
+            return dict(json.load(f))
+    except (OSError, ValueError):
+        return dict()
+
+
+def save_weights(weights: dict) -> None:
+    os.makedirs(DATA_DIR, exist_ok=True)
+    tmp_path = WEIGHTS_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(weights, f)
+    os.replace(tmp_path, WEIGHTS_PATH)
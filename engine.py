@@ -0,0 +1,162 @@
+"""Typing state engine.
+
+The target text is kept in one flat buffer (words concatenated without separators) plus an offsets
+array marking where each word starts; the per-character status codes live in a bytearray aligned
+with the text buffer. A key event only ever touches the current word, so its cost does not depend on
+the length of the text. The stats are running counters, updated as the words get typed.
+"""
+from array import array
+
+# per-character status codes
+UNTYPED = 0
+CORRECT = 1
+WRONG = 2
+
+
+class TypingState:
+    """Typing state of a text.
+
+    Word indices are global, ie they keep counting from the first word of the text even after the
+    typed words got retired (see `retire`); the buffers only hold the words from `first_word` on.
+    """
+    def __init__(self, words: list[str]) -> None:
+        assert len(words) > 0
+        self.text = ""
+        self.offsets = array("L", [0])
+        self.status = bytearray()
+        self.first_word = 0
+        self.extend(words)
+        self.word_idx = 0
+        # index of the last typed char of the current word; -1 means nothing typed yet and it can go
+        # beyond the end of the word if the user keeps typing
+        self.char_idx = -1
+        self.finished = False
+        # stats of the completed words, plus the number of correct letters of the current word
+        self.counts = dict(n_chars=0, n_correct_chars=0, n_words=0, n_correct_words=0)
+        self._word_correct = 0
+        # word length -> [words, correct words, correct chars] of the completed words
+        self.length_counts = dict()
+
+    @property
+    def num_words(self) -> int:
+        return self.first_word + len(self.offsets) - 1
+
+    @property
+    def cursor_pos(self) -> tuple[int, int]:
+        return self.word_idx, self.char_idx
+
+    def word_offset(self, word_idx: int) -> int:
+        """Offset of the first char of the word in the text buffer."""
+        return self.offsets[word_idx - self.first_word]
+
+    def word(self, word_idx: int) -> str:
+        i = word_idx - self.first_word
+        return self.text[self.offsets[i]:self.offsets[i + 1]]
+
+    def word_status(self, word_idx: int) -> bytearray:
+        i = word_idx - self.first_word
+        return self.status[self.offsets[i]:self.offsets[i + 1]]
+
+    def extend(self, words: list[str]) -> None:
+        """Append words to the end of the text."""
+        # NOTE: this copies the text buffer -> add words in chunks rather than one by one
+        self.text += "".join(words)
+        self.status.extend(bytes(len(self.text) - len(self.status)))
+        for word in words:
+            self.offsets.append(self.offsets[-1] + len(word))
+
+    def retire(self, word_idx: int) -> None:
+        """Drop the (already typed) words before `word_idx` from the buffers (their stats stay counted)."""
+        assert word_idx <= self.word_idx
+        n = word_idx - self.first_word
+        if n <= 0:
+            return
+        cut = self.offsets[n]
+        self.text = self.text[cut:]
+        del self.status[:cut]
+        self.offsets = array("L", [offset - cut for offset in self.offsets[n:]])
+        self.first_word = word_idx
+
+    def type_char(self, char: str) -> None:
+        if self.finished:
+            return
+        i = self.word_idx - self.first_word
+        pos = self.offsets[i] + self.char_idx + 1
+        if pos < self.offsets[i + 1]:
+            if self.text[pos] == char:
+                self.status[pos] = CORRECT
+                self._word_correct += 1
+            else:
+                self.status[pos] = WRONG
+        # NOTE: chars typed beyond the end of the word only move the cursor
+        self.char_idx += 1
+
+    def type_chars(self, chars: str) -> None:
+        """Type a run of chars (no spaces) in one go."""
+        if self.finished or not chars:
+            return
+        i = self.word_idx - self.first_word
+        start = self.offsets[i] + self.char_idx + 1
+        end = min(start + len(chars), self.offsets[i + 1])
+        if start < end:
+            expected = self.text[start:end]
+            if chars.startswith(expected):
+                self.status[start:end] = bytes([CORRECT]) * (end - start)
+                self._word_correct += end - start
+            else:
+                self.status[start:end] = bytes(CORRECT if a == b else WRONG for a, b in zip(expected, chars))
+                self._word_correct += self.status.count(CORRECT, start, end)
+        self.char_idx += len(chars)
+
+    def backspace(self) -> None:
+        if self.finished or self.char_idx == -1:
+            return
+        i = self.word_idx - self.first_word
+        pos = self.offsets[i] + self.char_idx
+        if pos < self.offsets[i + 1]:
+            self._word_correct -= self.status[pos] == CORRECT
+            self.status[pos] = UNTYPED
+        self.char_idx -= 1
+
+    def space(self) -> bool:
+        """Advance to the next word; return True if that was the last word."""
+        if self.finished or self.char_idx == -1:
+            # space before typing anything in the word (eg double space) -> ignore
+            return self.finished
+        # the user hit space before finishing the word -> all of the untyped letters are wrong
+        i = self.word_idx - self.first_word
+        start = self.offsets[i] + self.char_idx + 1
+        end = self.offsets[i + 1]
+        if start < end:
+            self.status[start:end] = bytes([WRONG]) * (end - start)
+        word_len = end - self.offsets[i]
+        self.counts["n_chars"] += word_len
+        self.counts["n_correct_chars"] += self._word_correct
+        self.counts["n_words"] += 1
+        self.counts["n_correct_words"] += self._word_correct == word_len
+        length_counts = self.length_counts.get(word_len)
+        if length_counts is None:
+            length_counts = self.length_counts[word_len] = [0, 0, 0]
+        length_counts[0] += 1
+        length_counts[1] += self._word_correct == word_len
+        length_counts[2] += self._word_correct
+        self._word_correct = 0
+        self.word_idx += 1
+        self.char_idx = -1
+        self.finished = self.word_idx == self.num_words
+        return self.finished
+
+    def stats(self) -> dict:
+        """Chars stats (all, correct, %) and word stats (all, correct, %) of the words typed so far."""
+        n_chars = self.counts["n_chars"]
+        n_correct_chars = self.counts["n_correct_chars"]
+        n_words = self.counts["n_words"]
+        n_correct_words = self.counts["n_correct_words"]
+        return dict(
+            n_chars=n_chars,
+            n_correct_chars=n_correct_chars,
+            correct_chars_pct=int(round(100*n_correct_chars/n_chars, 0)) if n_chars else 0,
+            n_words=n_words,
+            n_correct_words=n_correct_words,
+            correct_words_pct=int(round(100*n_correct_words/n_words, 0)) if n_words else 0,
+        )
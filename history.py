@@ -0,0 +1,146 @@
+"""Round history kept in a local SQLite database.
+
+Rounds get handed to a background writer thread which stores them in batches (one transaction per
+batch), so finishing a round never waits on the disk. Besides the totals of every round the per word
+length counters get stored too. The queries of stats.py pick the last rounds by id (the rowid of
+the rounds table, the leading column of the word_lengths keys) and the per length aggregate is
+covered by the word_lengths index.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+import typing
+
+from document import DATA_DIR
+
+HISTORY_PATH = os.path.join(DATA_DIR, "history.sqlite")
+# the writer waits this long for more rounds before writing a batch
+BATCH_SECONDS = 1.0
+BATCH_SIZE = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rounds (
+    id INTEGER PRIMARY KEY,
+    finished_at REAL NOT NULL,
+    mode TEXT NOT NULL,
+    duration REAL NOT NULL,
+    wpm REAL NOT NULL,
+    n_chars INTEGER NOT NULL,
+    n_correct_chars INTEGER NOT NULL,
+    n_words INTEGER NOT NULL,
+    n_correct_words INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS word_lengths (
+    round_id INTEGER NOT NULL REFERENCES rounds (id),
+    length INTEGER NOT NULL,
+    n_words INTEGER NOT NULL,
+    n_correct_words INTEGER NOT NULL,
+    n_correct_chars INTEGER NOT NULL,
+    PRIMARY KEY (round_id, length)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS word_lengths_length ON word_lengths (length, round_id, n_words, n_correct_words, n_correct_chars);
+"""
+
+
+def connect(path: str = HISTORY_PATH) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    connection = sqlite3.connect(path)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def round_record(session, mode: str) -> dict:
+    """What gets stored of a (finished) TypingSession."""
+    stats = session.stats()
+    return dict(
+        finished_at=time.time(),
+        mode=mode,
+        duration=session.elapsed(),
+        wpm=stats["wpm"],
+        n_chars=stats["n_chars"],
+        n_correct_chars=stats["n_correct_chars"],
+        n_words=stats["n_words"],
+        n_correct_words=stats["n_correct_words"],
+        word_lengths=[(length, *counts) for length, counts in session.state.length_counts.items()],
+    )
+
+
+def write_rounds(connection: sqlite3.Connection, records: list[dict]) -> None:
+    with connection:
+        for record in records:
+            cursor = connection.execute(
+                "INSERT INTO rounds (finished_at, mode, duration, wpm, n_chars, n_correct_chars, n_words, n_correct_words) "
+                "VALUES (:finished_at, :mode, :duration, :wpm, :n_chars, :n_correct_chars, :n_words, :n_correct_words)",
+                record,
+            )
+            connection.executemany(
+                "INSERT INTO word_lengths (round_id, length, n_words, n_correct_words, n_correct_chars) VALUES (?, ?, ?, ?, ?)",
+                [(cursor.lastrowid, *row) for row in record["word_lengths"]],
+            )
+
+
+class HistoryWriter:
+    """Stores the rounds from a background thread; `submit` only queues them."""
+    def __init__(self, path: str = HISTORY_PATH) -> None:
+        self.path = path
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="typy-history", daemon=True)
+        self._thread.start()
+
+    def submit(self, record: dict) -> None:
+        self._queue.put(record)
+
+    def close(self) -> None:
+        """Write whatever is still queued and stop the thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        connection = None
+        done = False
+        while not done:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + BATCH_SECONDS
+            while batch[-1] is not None and len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                done = True
+                batch.pop()
+            if not batch:
+                continue
+            try:
+                if connection is None:
+                    connection = connect(self.path)
+                write_rounds(connection, batch)
+            except sqlite3.Error:
+                # NOTE: losing the history must not take the game down
+                pass
+        if connection is not None:
+            connection.close()
+
+
+def wpm_trend(connection: sqlite3.Connection, last: int) -> list[tuple]:
+    """(id, finished_at, wpm, char accuracy %) of the last rounds, oldest first."""
+    rows = connection.execute(
+        "SELECT id, finished_at, wpm, 100.0 * n_correct_chars / MAX(n_chars, 1) FROM rounds ORDER BY id DESC LIMIT ?",
+        (last,),
+    ).fetchall()
+    return rows[::-1]
+
+
+def accuracy_by_word_length(connection: sqlite3.Connection, last: typing.Optional[int] = None) -> list[tuple]:
+    """(length, words, word accuracy %, char accuracy %) per word length, over the last rounds."""
+    first_id = 0
+    if last is not None:
+        first_id = connection.execute("SELECT COALESCE(MAX(id), 0) - ? FROM rounds", (last,)).fetchone()[0]
+    return connection.execute(
+        "SELECT length, SUM(n_words), 100.0 * SUM(n_correct_words) / SUM(n_words), "
+        "100.0 * SUM(n_correct_chars) / SUM(n_words * length) "
+        "FROM word_lengths WHERE round_id > ? GROUP BY length ORDER BY length",
+        (first_id,),
+    ).fetchall()
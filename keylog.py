@@ -0,0 +1,178 @@
+"""Keystroke log of a typing session.
+
+Every key event is one entry in a few parallel arrays (timestamp, kind, typed char, expected char,
+resulting status), about 18 bytes per key and no Python object per key. Logs get appended to a
+binary file as they are finished and can be replayed through a fresh TypingSession afterwards, either
+as fast as possible or paced like the original (optionally sped up).
+
+    python keylog.py typy_keys.log --speed 4
+"""
+import argparse
+import struct
+import sys
+import time
+import typing
+from array import array
+from itertools import zip_longest
+
+from engine import CORRECT, WRONG
+
+# event kinds
+CHAR = 0
+SPACE = 1
+BACKSPACE = 2
+# intervals between keys longer than this are breaks rather than typing
+PAUSE_NS = 2_000_000_000
+
+LOG_MAGIC = b"TYPYKEY1"
+# number of events, size of the words (utf-8 bytes), start time, end time (ns; -1 if not set)
+LOG_HEADER = struct.Struct("<QQqq")
+
+
+class KeyLog:
+    """With `keep_keys=False` only the start and end time get kept (neither the keys nor the words)."""
+    def __init__(self, words: typing.Iterable[str] = (), keep_keys: bool = True) -> None:
+        self.keep_keys = keep_keys
+        self.words = list(words) if keep_keys else list()
+        # monotonic timestamps (ns)
+        self.times = array("q")
+        self.kinds = array("B")
+        # code points of the typed char and of the letter it was compared against (0: none)
+        self.chars = array("I")
+        self.expected = array("I")
+        # status the typed char left behind (engine status codes)
+        self.status = array("B")
+        # the timer starts on the first typed char; end_time is set once the session is over
+        self.start_time = None
+        self.end_time = None
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def record(self, t: int, kind: int, char: str = "", expected: str = "", status: int = 0) -> None:
+        if kind == CHAR and self.start_time is None:
+            self.start_time = t
+        if not self.keep_keys:
+            return
+        self.times.append(t)
+        self.kinds.append(kind)
+        self.chars.append(ord(char) if char else 0)
+        self.expected.append(ord(expected) if expected else 0)
+        self.status.append(status)
+
+    def record_chars(self, t: int, chars: str, expected: str) -> None:
+        """Record a run of typed chars; `expected` holds the letters they were compared against."""
+        n = len(chars)
+        if n == 0:
+            return
+        if self.start_time is None:
+            self.start_time = t
+        if not self.keep_keys:
+            return
+        self.times.extend([t]*n)
+        self.kinds.extend(bytes([CHAR])*n)
+        self.chars.extend(map(ord, chars))
+        self.expected.extend(map(ord, expected))
+        if len(expected) < n:
+            # NOTE: chars typed beyond the end of the word count as wrong
+            self.expected.extend([0]*(n - len(expected)))
+        if len(expected) == n and chars == expected:
+            self.status.extend(bytes([CORRECT])*n)
+        else:
+            self.status.extend(bytes(CORRECT if a == b else WRONG for a, b in zip_longest(chars, expected[:n])))
+
+    def keys(self) -> typing.Iterator[tuple[int, str]]:
+        """(timestamp, key event) of every entry, in the form TypingSession.apply takes them."""
+        for t, kind, char in zip(self.times, self.kinds, self.chars):
+            if kind == CHAR:
+                yield t, chr(char)
+            elif kind == SPACE:
+                yield t, " "
+            else:
+                yield t, "backspace"
+
+    def write(self, f: typing.BinaryIO) -> None:
+        words = " ".join(self.words).encode()
+        f.write(LOG_MAGIC)
+        f.write(LOG_HEADER.pack(
+            len(self.times),
+            len(words),
+            self.start_time if self.start_time is not None else -1,
+            self.end_time if self.end_time is not None else -1,
+        ))
+        f.write(words)
+        for buffer in (self.times, self.kinds, self.chars, self.expected, self.status):
+            buffer.tofile(f)
+
+    @classmethod
+    def read(cls, f: typing.BinaryIO) -> typing.Optional["KeyLog"]:
+        """Read the next log from the file (None at the end of the file)."""
+        magic = f.read(len(LOG_MAGIC))
+        if not magic:
+            return None
+        if magic != LOG_MAGIC:
+            raise ValueError("not a keystroke log")
+        n, words_size, start_time, end_time = LOG_HEADER.unpack(f.read(LOG_HEADER.size))
+        log = cls(f.read(words_size).decode().split(" "))
+        for buffer in (log.times, log.kinds, log.chars, log.expected, log.status):
+            buffer.fromfile(f, n)
+        log.start_time = start_time if start_time != -1 else None
+        log.end_time = end_time if end_time != -1 else None
+        return log
+
+
+def append_log(path: str, log: KeyLog) -> None:
+    with open(path, "ab") as f:
+        log.write(f)
+
+
+def load_logs(path: str) -> list[KeyLog]:
+    logs = list()
+    with open(path, "rb") as f:
+        while (log := KeyLog.read(f)) is not None:
+            logs.append(log)
+    return logs
+
+
+def replay(log: KeyLog, speed: typing.Optional[float] = None, on_key: typing.Optional[typing.Callable] = None) -> "TypingSession":
+    """Feed the logged keys through a fresh TypingSession and return it.
+
+    The session sees the logged timestamps, so its stats come out as they were. With a `speed` the
+    pauses between the keys get slept through (sped up `speed` times), otherwise it goes as fast as
+    possible. `on_key(session)` gets called after every key.
+    """
+    # NOTE: imported here, the session module imports this one
+    from session import TypingSession
+
+    now = [0]
+    session = TypingSession(log.words, clock=lambda: now[0])
+    prev = None
+    for t, key in log.keys():
+        if speed and prev is not None and t > prev:
+            time.sleep((t - prev) / 1e9 / speed)
+        prev = now[0] = t
+        session.apply(key)
+        if on_key is not None:
+            on_key(session)
+    if log.end_time is not None and not session.finished:
+        # the round got ended early
+        now[0] = log.end_time
+        session.stop()
+    return session
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog='TyPy replay', description='Replay recorded typing sessions')
+    parser.add_argument('log', help="Keystroke log written by main.py --record")
+    parser.add_argument('-s', '--speed', help="Replay this many times faster than the original (0: as fast as possible)", default=1.0, type=float)
+    args = parser.parse_args()
+
+    def show_progress(session) -> None:
+        stats = session.stats()
+        print(f"\rword {session.state.word_idx}/{session.state.num_words}  wpm {stats['wpm']:<4}", end="", file=sys.stderr)
+
+    for i, log in enumerate(load_logs(args.log)):
+        session = replay(log, args.speed or None, show_progress if args.speed else None)
+        stats = session.stats()
+        print(f"\rround {i + 1}: {len(log)} keys, chars {stats['n_correct_chars']}/{stats['n_chars']} ({stats['correct_chars_pct']}%), "
+              f"words {stats['n_correct_words']}/{stats['n_words']} ({stats['correct_words_pct']}%), wpm {stats['wpm']}")
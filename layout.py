@@ -0,0 +1,69 @@
+"""Line-break index of the word box.
+
+Words are wrapped greedily and lazily: the index only grows as far as it gets asked about. Line
+starts are kept in a sorted array, so looking up the line of a word is a binary search.
+"""
+from array import array
+from bisect import bisect_right
+
+from engine import TypingState
+
+
+class LineIndex:
+    def __init__(self, state: TypingState, width: int, first_word: int = 0) -> None:
+        self.state = state
+        self.width = width
+        self._reset(first_word)
+
+    def _reset(self, first_word: int) -> None:
+        # NOTE: line numbers count from the line starting at `first_word`
+        self.first_word = first_word
+        self.line_starts = array("L", [first_word])  # first word of each line wrapped so far
+        self.wrapped = first_word  # words before this index are wrapped
+        self._line_width = 0  # width of the last line wrapped so far
+
+    def resize(self, width: int, anchor_word: int) -> None:
+        """Re-wrap for a new width starting at `anchor_word`, which becomes the start of line 0.
+
+        Wrapping is greedy, so the lines after a line start do not depend on anything before it and
+        there is no need to re-wrap the words before the anchor.
+        """
+        self.width = width
+        self._reset(anchor_word)
+
+    def _wrap_next_word(self) -> None:
+        word_idx = self.wrapped
+        word_len = self.state.word_offset(word_idx+1) - self.state.word_offset(word_idx)
+        if self._line_width and self._line_width + 1 + word_len > self.width:
+            # the word does not fit in the current line -> start a new one
+            self.line_starts.append(word_idx)
+            self._line_width = word_len
+        else:
+            self._line_width += (1 if self._line_width else 0) + word_len  # space between words
+        self.wrapped += 1
+
+    def wrap_until_line(self, line_idx: int) -> None:
+        """Wrap words until the line `line_idx` is complete (or the text runs out)."""
+        while self.wrapped < self.state.num_words and len(self.line_starts) < line_idx + 2:
+            self._wrap_next_word()
+
+    @property
+    def num_lines(self) -> int:
+        """Number of lines wrapped so far."""
+        return len(self.line_starts)
+
+    def line_of(self, word_idx: int) -> int:
+        assert word_idx >= self.first_word
+        while self.wrapped <= word_idx:
+            self._wrap_next_word()
+        return bisect_right(self.line_starts, word_idx) - 1
+
+    def column_of(self, word_idx: int) -> int:
+        line_start = self.line_starts[self.line_of(word_idx)]
+        # every word before it in the line is followed by a space
+        return self.state.word_offset(word_idx) - self.state.word_offset(line_start) + word_idx - line_start
+
+    def line_words(self, line_idx: int) -> range:
+        start = self.line_starts[line_idx]
+        end = self.line_starts[line_idx+1] if line_idx + 1 < len(self.line_starts) else self.wrapped
+        return range(start, end)
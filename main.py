@@ -26,26 +26,43 @@ TODO:
 - [x] add wpm to the stats;
 - [x] print stats in an overlay widget;
 - [x] add argparse for at least number of words;
+- [x] keep the typing state in flat buffers so that key events do not depend on the text length;
+- [x] show the stats live while typing;
+- [x] record the keystrokes and replay them;
+- [x] per key and per bigram analytics;
+- [x] keep the history of the rounds;
+- [x] adaptive mode drilling the weak letters/bigrams;
+- [x] race mode with the opponent cursors in the word box;
+- [x] prepare the next round behind the game over popup so that retry is instant;
 """
 import urwid
 import typing
 from functools import partial
-from enum import Enum
+from itertools import cycle, islice
 from typing import Optional
-import time
+import os
 import argparse
+import time
 
+from corpus import Corpus
+from document import Document, load_resume_offset, save_resume_offset
+from drill import Drill, NgramIndex, load_weights, save_weights
+from engine import TypingState
+from history import HistoryWriter, round_record
+from keylog import append_log
+from layout import LineIndex
 from popup import WidgetWithGameOverPopup
-
-
-class LetterStatus(Enum):
-    CORRECT = "correct"
-    WRONG = "wrong"
-    DEFAULT = "default"
-    CURRENT_LETTER = "current_letter"
-    CORRECT_CURRENT_WORD = "correct_current_word"
-    WRONG_CURRENT_WORD = "wrong_current_word"
-    DEFAULT_CURRENT_WORD = "default_current_word"
+from profiling import Profiler
+from race import CLIENT_TICK_SECONDS, RaceClient, parse_address
+from session import TypingSession
+from vocab import VOCAB
+import wordbox
+from wordbox import LetterStatus, WordBox
+try:
+    import analytics
+except ImportError:
+    # NOTE: numpy is optional, without it the game over screen only shows the basic stats
+    analytics = None
 
 
 PALETTE: list[tuple[str, str, str]] = [
@@ -56,63 +73,12 @@ PALETTE: list[tuple[str, str, str]] = [
     (LetterStatus.CORRECT_CURRENT_WORD, "black", "dark green"),
     (LetterStatus.WRONG_CURRENT_WORD, "black", "dark red"),
     (LetterStatus.DEFAULT_CURRENT_WORD, "dark blue", "black"),
+    (LetterStatus.OPPONENT, "black", "yellow"),
     # pop-up style
     ("popbg", "dark red", "black"),
 ]
 
 
-VOCAB = [
-    "few", "public", "little", "who", "under", "some", "first", "see", "just", "interest",
-    "down", "after", "both", "take", "no", "use", "own", "however", "stand", "system", "you",
-    "find", "small", "same", "and", "get", "own", "by", "run", "group", "where", "old", "fact", "he",
-    "we", "over", "high", "fact", "over", "people", "use", "end", "while", "also", "help", "form", "do",
-]
-
-
-def get_word_repr(word: str, letter_colors: list[str]) -> urwid.Columns:
-    return [(1, urwid.Text((c, l))) for c, l in zip(letter_colors, word)]
-
-
-def get_word_widget(word: str, letter_colors: list[str]) -> urwid.Columns:
-    assert len(word) == len(letter_colors)
-    letters = get_word_repr(word, letter_colors)
-    return urwid.Columns(letters, dividechars=0)
-
-
-def get_line_repr(words: list[str], color_map: list[list[str]]):
-    return [(len(w), get_word_widget(w, cs)) for w, cs in zip(words, color_map)]
-
-
-def get_line_widget(words: list[str], color_map: list[list[str]]) -> urwid.Columns:
-    assert len(words) == len(color_map)
-    line = get_line_repr(words, color_map)
-    return urwid.Columns(line, dividechars=1)
-
-
-def wrap_lines(words, max_width: int):
-    wrapped_lines = list()
-    current_line_width = 0
-    current_line = list()
-    for word in words:
-        if len(word) + current_line_width < max_width:
-            current_line_width += 1 if current_line else 0  # space between words
-            current_line_width += len(word)
-            current_line.append(word)
-        else:
-            wrapped_lines.append(current_line)
-            current_line_width = len(word)
-            current_line = [word]
-    wrapped_lines.append(current_line)
-    return wrapped_lines
-
-
-def get_word_matrix(words: list[str], color_map: list[list[str]], box_dim: tuple[int, int] = (50, 10)) -> list[urwid.Columns]:
-    max_width, _ = box_dim
-    l1 = wrap_lines(words, max_width)
-    l2 = wrap_lines(color_map, max_width)
-    return [get_line_widget(line, cm) for line, cm in zip(l1, l2)]
-
-
 def get_gui(stats_table, word_box, input_field, button_inst) -> urwid.Widget:
     div = urwid.Divider()
     pile = urwid.Pile([stats_table, word_box, div, input_field, div, button_inst])
@@ -120,105 +86,6 @@ def get_gui(stats_table, word_box, input_field, button_inst) -> urwid.Widget:
     return top
 
 
-class GameOverException(Exception):
-    def __init__(self, word_mask, start_time: Optional[float] = None, msg: str = "Game over", *args):
-        super().__init__(msg, *args)
-        self.word_mask = word_mask
-        self.start_time = start_time
-
-
-def get_colors(word_mask: list[list[Optional[bool]]], cursor_pos: tuple[int, int]) -> list[list[LetterStatus]]:
-    word_idx, char_idx = cursor_pos
-    def _map_mask_value_to_color(mask_value: Optional[bool], current_word: bool) -> LetterStatus:
-        if current_word:
-            if mask_value is None:
-                return LetterStatus.DEFAULT_CURRENT_WORD
-            elif mask_value:
-                return LetterStatus.CORRECT_CURRENT_WORD
-            else:
-                return LetterStatus.WRONG_CURRENT_WORD
-        else:
-            if mask_value is None:
-                return LetterStatus.DEFAULT
-            elif mask_value:
-                return LetterStatus.CORRECT
-            else:
-                return LetterStatus.WRONG
-    result = [[_map_mask_value_to_color(mv, False) for mv in wm] for wm in word_mask]
-    current_word_colors = [_map_mask_value_to_color(mv, True) for mv in word_mask[word_idx]]
-    if char_idx < len(word_mask[word_idx]) - 1:
-        current_word_colors[char_idx+1] = LetterStatus.CURRENT_LETTER
-    result[word_idx] = current_word_colors
-    return result
-
-def correct_char(word: str, char_idx: int, char: str) -> bool:
-    assert len(word) > 0
-    assert char_idx > -1
-    assert char_idx < len(word)
-    # assert len(char) == 1
-    return word[char_idx] == char
-
-
-def init_word_mask(words: list[str]) -> list[Optional[bool]]:
-    return [[None]*len(w) for w in words]
-
-
-def update_word_mask(
-    words: list[str],
-    word_mask: list[Optional[bool]],
-    cursor_pos: tuple[int, int],
-    char: str,
-) -> list[list[Optional[bool]]]:
-    assert len(words) == len(word_mask)
-
-    word_idx, char_idx = cursor_pos
-    assert char_idx > -2  # can be -1
-    assert word_idx > -1
-
-    if word_idx >= len(word_mask):
-        # pressing space after the last word -> advance beyond the bounds -> game over
-        # NOTE: need to make sure the Nones in the last word are taken care of
-        prev_words_masks = word_mask[:word_idx]
-        for i, prev_word_mask in enumerate(prev_words_masks):
-            prev_words_masks[i] = [False if x is None else x for x in prev_word_mask]
-        word_mask[:word_idx] = prev_words_masks
-        raise GameOverException(word_mask)
-
-    # current word
-    current_word = words[word_idx]
-    current_word_mask = word_mask[word_idx]
-
-    if char_idx >= len(current_word):
-        # the user kept typing beyond the length of the word -> keep everything up to the end as it is
-        return word_mask
-    
-    # all before word idx: if there are any Nones there it means the user hit space before finishing
-    # typing the word -> convert all of the untyped letters to False
-    prev_words_masks = word_mask[:word_idx]
-    for i, prev_word_mask in enumerate(prev_words_masks):
-        prev_words_masks[i] = [False if x is None else x for x in prev_word_mask]
-    word_mask[:word_idx] = prev_words_masks
-
-    # all after word idx
-    next_words_masks = word_mask[word_idx+1:]
-    assert all([all([x is None for x in wm]) for wm in next_words_masks])
-
-    if char_idx == -1:
-        # user hit backspace so many times we are back at the beginning of the word
-        current_word_mask = [None]*len(current_word_mask)
-    else:
-        prev_chars = current_word_mask[:char_idx]
-        assert all([c is not None for c in prev_chars])
-
-        # re-init all the values in the mask after the current char (eg if the user hit back space key)
-        current_word_mask[char_idx+1:] = [None]*len(current_word_mask[char_idx+1:])
-
-        # check the current char
-        current_word_mask[char_idx] = correct_char(current_word, char_idx=char_idx, char=char)
-    word_mask[word_idx] = current_word_mask
-    return word_mask
-
-
 def get_stats_widget(stats: dict = {}) -> urwid.Pile:
     """Stats to display: chars stats (all, correct, %), word stats (all, correct, %), wpm."""
     n_chars = stats['n_chars'] if 'n_chars' in stats else ''
@@ -241,145 +108,303 @@ def get_stats_widget(stats: dict = {}) -> urwid.Pile:
     return urwid.Pile([char_stats, word_stats, wpm])
 
 
-def main(num_words: int) -> None:
-    def get_word_list(n: int) -> list[str]:
+# the screen never gets redrawn more often than this
+MAX_FPS = 60
+
+# how often the stats above the word box get refreshed while typing
+STATS_REFRESH_SECONDS = 0.25
+# the next round gets prepared this long after the game over popup opened (after its first frame)
+PREPARE_DELAY_SECONDS = 0.05
+
+# race mode: how often the own cursor gets published
+RACE_TICK_SECONDS = CLIENT_TICK_SECONDS
+
+# profile mode: width of the overlay and how often it gets refreshed
+PROFILE_OVERLAY_WIDTH = 24
+PROFILE_REFRESH_SECONDS = 0.5
+
+# endless mode: keep this many words ahead of the cursor...
+ENDLESS_WORDS_AHEAD = 200
+# ...and retire the typed words once there are this many of them
+ENDLESS_RETIRE_AFTER = 500
+
+
+class TypingMainLoop(urwid.MainLoop):
+    """Main loop that coalesces bursts of keys and caps the redraw rate.
+
+    Runs of printable keys that arrive together (fast typing, a paste) get handed to `type_text` in
+    one go instead of key by key; if it returns False they go the usual way. Redraws are scheduled
+    via an alarm so that there is at most one per 1/`max_fps` seconds.
+    """
+    def __init__(self, *args, type_text: Optional[typing.Callable[[str], bool]] = None, max_fps: int = MAX_FPS, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.type_text = type_text
+        self.frame_interval = 1.0 / max_fps
+        self._last_draw = 0.0
+        self._draw_alarm = None
+
+    def process_input(self, keys: typing.Iterable) -> bool:
+        if self.type_text is None:
+            return super().process_input(keys)
+        handled = False
+        run = list()
+        for key in list(keys) + [None]:
+            if isinstance(key, str) and len(key) == 1 and key.isprintable():
+                run.append(key)
+                continue
+            if run:
+                if self.type_text("".join(run)):
+                    handled = True
+                else:
+                    handled |= super().process_input(run)
+                run = list()
+            if key is not None:
+                handled |= super().process_input([key])
+        return handled
+
+    def entering_idle(self) -> None:
+        wait = self._last_draw + self.frame_interval - time.monotonic()
+        if wait > 0:
+            # drawn not long ago -> draw once the frame is over (whatever else comes in until then
+            # gets drawn along)
+            if self._draw_alarm is None:
+                self._draw_alarm = self.set_alarm_in(wait, self._on_draw_alarm)
+            return
+        super().entering_idle()
+
+    def _on_draw_alarm(self, _loop: urwid.MainLoop, _user_data) -> None:
+        # NOTE: the event loop goes idle right after an alarm, which does the drawing
+        self._draw_alarm = None
+
+    def draw_screen(self) -> None:
+        self._last_draw = time.monotonic()
+        super().draw_screen()
+
+
+def build_app(
+    num_words: Optional[int],
+    visible_lines: Optional[int] = None,
+    endless: bool = False,
+    corpus: Optional[Corpus] = None,
+    document: Optional[Document] = None,
+    screen: Optional[urwid.BaseScreen] = None,
+    profiler: Optional[Profiler] = None,
+    record_path: Optional[str] = None,
+    history: Optional[HistoryWriter] = None,
+    adaptive: bool = False,
+    race: Optional[RaceClient] = None,
+) -> dict:
+    """Build the main loop and the widgets without running the loop."""
+    def word_generator() -> typing.Iterator[str]:
+        if corpus is not None:
+            yield from corpus.words()
         from random import choice
-        return [choice(VOCAB) for _ in range(n)]
-        # return ["hi", "bye", "wee"]
-        # return ["aaaaaa", "bbbb"]
+        while True:
+            yield choice(VOCAB)
+
+    # text mode: the words come from a document and every round picks up where the last one stopped
+    word_source = dict()
+    if document is not None:
+        word_source["round_start"] = load_resume_offset(document.path)
+        word_source["words"] = document.words(word_source["round_start"])
+    elif race is not None:
+        # race mode: every round goes through the words of the race
+        word_source["words"] = cycle(race.words)
+        num_words = len(race.words)
+    else:
+        word_source["words"] = word_generator()
 
-    NUM_WORDS = num_words
-    WORDS = get_word_list(NUM_WORDS)
+    # adaptive mode: part of the words get picked for the letters/bigrams that went worst lately
+    drill = None
+    if adaptive:
+        index = NgramIndex.for_corpus(corpus) if corpus is not None else NgramIndex.build(VOCAB.__getitem__, len(VOCAB))
+        drill = Drill(index, word_source["words"], load_weights())
+        word_source["words"] = drill.words()
 
-    def exit_on_q(key: str) -> None:
-        if key in {"q", "Q"}:
-            raise urwid.ExitMainLoop()
+    def get_word_list(n: int) -> list[str]:
+        return list(islice(word_source["words"], n))
 
-    def on_exit_clicked(_button: urwid.Button) -> typing.NoReturn:
-        raise urwid.ExitMainLoop()
+    def save_resume_point(typing_state: TypingState) -> None:
+        """Text mode: remember the offset after the last typed word and continue from there."""
+        if document is None:
+            return
+        offset = document.skip_words(word_source["round_start"], typing_state.word_idx)
+        save_resume_offset(document.path, offset)
+        word_source["round_start"] = offset
+        word_source["words"] = document.words(offset)
+
+    def save_key_log(session: TypingSession) -> None:
+        """Append the keys of the round to the keystroke log file (if recording)."""
+        if record_path is None or session.start_time is None:
+            return
+        session.stop()
+        append_log(record_path, session.log)
+
+    mode = "text" if document is not None else "corpus" if corpus is not None else "race" if race is not None else "words"
+    if endless:
+        mode = "endless " + mode
+    if adaptive:
+        mode = "adaptive " + mode
+    # NOTE: an endless round keeps only the words in the window and its stats in memory; its keys
+    # only get kept when they are going to be recorded or drilled on
+    keep_keys = not endless or record_path is not None or adaptive
+
+    def save_history(session: TypingSession) -> None:
+        """Queue the results of the round for the history database (written in the background)."""
+        if history is None or session.start_time is None:
+            return
+        session.stop()
+        history.submit(round_record(session, mode))
 
-    def on_input_change_closure(words, screen_dim):
-        def _clean_state(state: dict, word_list: Optional[list[str]] = None) -> dict:
-            state["cursor_pos"] = (0, -1)
-            state["words"] = word_list or words
-            state["word_mask"] = init_word_mask(state["words"])
-            state["typed_so_far"] = ""
-            state["colors"] = None
-            state["game_start_time"] = None
+    def update_drill(session: TypingSession) -> None:
+        if drill is None or session.start_time is None:
+            return
+        drill.update(session.log)
 
-        app_state = dict()
-        _clean_state(app_state)
+    def finish_round(session: TypingSession) -> None:
+        """Everything that gets kept of a round: resume point, keystrokes, history, drill weights."""
+        save_resume_point(session.state)
+        save_key_log(session)
+        save_history(session)
+        update_drill(session)
 
-        def on_input_change(_edit: urwid.Edit, new_edit_text: str, word_widget: urwid.Pile, stats_widget: urwid.Pile) -> None:
-            """Redraw dynamically updated widgets on user input."""
+    def on_exit() -> None:
+        close_round()
+        if drill is not None:
+            save_weights(drill.weights)
 
-            # if app_state["game_start_time"] is None and app_state["cursor_pos"][0] == 0:
-            if app_state["game_start_time"] is None and app_state["cursor_pos"][0] == 0 and app_state["cursor_pos"][1] > -1:
-                # we are at the beginning of the game -> start timer
-                app_state["game_start_time"] = time.time()
+    NUM_WORDS = ENDLESS_WORDS_AHEAD if endless else num_words
+    WORDS = get_word_list(NUM_WORDS)
 
-            if len(new_edit_text) == 0:
-                # this will happen when the _edit.edit_text is set to "" by the postchange event
-                app_state["typed_so_far"] = new_edit_text
-                x, _ = app_state["cursor_pos"]
-                new_cursor_pos = (x, -1)
-                app_state["cursor_pos"] = new_cursor_pos
+    def on_exit_clicked(_button: urwid.Button) -> typing.NoReturn:
+        raise urwid.ExitMainLoop()
 
-                # NOTE: this call wont raise the game over exception because this if branch does not
-                # advance the word_idx
-                new_word_mask = update_word_mask(app_state["words"], app_state["word_mask"], new_cursor_pos, "")
-                app_state["word_mask"] = new_word_mask
+    def on_input_change_closure(session: TypingSession) -> tuple[typing.Callable, ...]:
+        def _clean_state(state: dict, session: TypingSession) -> dict:
+            state["session"] = session
+            state["typed_so_far"] = ""
+            state["round_over"] = False
+            # (session, prepared word box) of the next round, see prepare_next_round
+            state["next_round"] = None
 
-                new_colors = get_colors(new_word_mask, new_cursor_pos)
-                app_state["colors"] = new_colors
+        app_state = dict()
+        _clean_state(app_state, session)
 
-                new_word_matrix = get_word_matrix(app_state["words"], new_colors, screen_dim)
-                word_widget.contents = [(w, word_widget.options()) for w in new_word_matrix]
+        def end_round(word_widget: WordBox, stats_widget: urwid.Pile) -> None:
+            """Show the stats of the words typed so far; the next round gets prepared behind the popup."""
+            session = app_state["session"]
+            if session.start_time is None or app_state["round_over"]:
+                # nothing typed yet / the popup is already up
+                return
+            app_state["round_over"] = True
+            session.stop()
+            stats = session.stats()
+            if analytics is not None and len(session.log):
+                stats["analytics"] = analytics.summary_lines(analytics.analyze([session.log]))
+            urwid.emit_signal(word_widget, "gameover", word_widget, stats, stats_widget)
+            # NOTE: the popup gets drawn first, the rest waits for the loop to be idle
+            loop.set_alarm_in(PREPARE_DELAY_SECONDS, lambda *_: prepare_next_round(word_widget))
+
+        def prepare_next_round(word_widget: WordBox) -> None:
+            """Keep the finished round, then draw and lay out the words of the next one off screen."""
+            if not app_state["round_over"] or app_state["next_round"] is not None:
+                return
+            # NOTE: the resume point and the drill weights decide the next words, so they go first
+            finish_round(app_state["session"])
+            next_session = TypingSession(get_word_list(NUM_WORDS), keep_keys=keep_keys)
+            app_state["next_round"] = (next_session, word_widget.prepare(next_session.state))
+
+        def start_next_round(word_widget: WordBox) -> None:
+            """Retry: swap the prepared round in (prepared right away if retry came before the loop was idle)."""
+            if not app_state["round_over"]:
                 return
+            prepare_next_round(word_widget)
+            next_session, ready = app_state["next_round"]
+            _clean_state(app_state, next_session)
+            # NOTE: a round ended with esc leaves its partial word in the input field
+            input_field.set_edit_text("")
+            word_widget.swap_in(ready)
+
+        def close_round() -> None:
+            """On exit: keep the current round, unless it already got kept when preparing the next one."""
+            if app_state["next_round"] is None:
+                finish_round(app_state["session"])
+
+        def on_input_change(_edit: urwid.Edit, new_edit_text: str, word_widget: WordBox, stats_widget: urwid.Pile) -> None:
+            """Redraw dynamically updated widgets on user input."""
+            session = app_state["session"]
+            typing_state = session.state
+            prev_word_idx = typing_state.word_idx
 
-            if all([c == " " for c in new_edit_text]):
+            if len(new_edit_text) > 0 and all([c == " " for c in new_edit_text]):
                 # if the user keeps spamming spaces before entering any non-space char then ignore
-                # TODO: check if this ever happens
-                _, y = app_state["cursor_pos"]
-                assert y == -1
                 return
 
-            # NOTE: Always possible because alternative is handled in the if clause above
-            last_char = new_edit_text[-1]
-
-            x, y = app_state["cursor_pos"]
-            if new_edit_text.endswith(" "):
-                # space -> move to the next word
-                new_cursor_pos = (x + 1, -1)
-            else:
-                if len(new_edit_text) < len(app_state["typed_so_far"]):
-                    # user hit backspace
-                    new_cursor_pos = (x, max(-1, y - 1))
-                else:
-                    new_cursor_pos = (x, y + 1)
-
-            app_state["cursor_pos"] = new_cursor_pos
+            typed_so_far = app_state["typed_so_far"]
             app_state["typed_so_far"] = new_edit_text
 
-            try:
-                new_word_mask = update_word_mask(app_state["words"], app_state["word_mask"], new_cursor_pos, last_char)
-            except GameOverException as e:
-                elapsed_time = time.time() - app_state["game_start_time"]
-                final_word_mask = e.word_mask
-                stats = _get_stats_from_word_mask(final_word_mask)
-                wpm = int(round(60.0 * NUM_WORDS / elapsed_time, 0))
-                stats["wpm"] = wpm
-                new_words = get_word_list(len(app_state["words"]))
-                urwid.emit_signal(word_widget, "gameover", word_widget, stats, stats_widget)
-                _clean_state(app_state, new_words)
+            if " " in typed_so_far and new_edit_text == typed_so_far.rsplit(" ", 1)[1]:
+                # the postchange event dropped the finished words from the edit field, nothing typed
+                return
+
+            # NOTE: a single change can carry several keys (a burst coalesced by the main loop or a
+            # paste) -> turn the difference into backspaces plus typed chars and feed them in one go
+            common = len(os.path.commonprefix([typed_so_far, new_edit_text]))
+            keys = "\b"*(len(typed_so_far) - common) + new_edit_text[common:]
+            if not keys:
                 return
+            session.feed(keys)
 
-            app_state["word_mask"] = new_word_mask
+            if session.finished:
+                end_round(word_widget, stats_widget)
+                return
 
-            new_colors = get_colors(new_word_mask, new_cursor_pos)
-            app_state["colors"] = new_colors
+            if endless and typing_state.word_idx != prev_word_idx:
+                if typing_state.num_words - typing_state.word_idx < ENDLESS_WORDS_AHEAD:
+                    session.extend(get_word_list(ENDLESS_WORDS_AHEAD))
+                if typing_state.word_idx - typing_state.first_word > ENDLESS_RETIRE_AFTER:
+                    word_widget.retire_typed_words()
 
-            new_word_matrix = get_word_matrix(app_state["words"], new_colors, box_dim=screen_dim)
-            word_widget.contents = [(w, word_widget.options()) for w in new_word_matrix]
+            # only the letters whose status changed get redrawn
+            word_widget.apply_diff(word_widget.color_map.diff())
             return
-        return on_input_change
+
+        def current_session() -> TypingSession:
+            return app_state["session"]
+        return on_input_change, end_round, current_session, start_next_round, close_round
 
     def clear_if_space(_edit: urwid.Edit, _: str) -> None:
-        if _edit.edit_text.endswith(" "):
-            # if the user presses space -> clear the edit field
-            _edit.set_edit_text(u"")
-
-    def _get_stats_from_word_mask(word_mask) -> dict:
-        assert all([all([x is not None for x in wm]) for wm in word_mask])
-        n_chars = sum([len(wm) for wm in word_mask])
-        n_correct_chars = sum([len([x for x in wm if x]) for wm in word_mask])
-        n_words = len(word_mask)
-        n_correct_words = sum([all([x for x in wm]) for wm in word_mask])
-        return dict(
-            n_chars=n_chars,
-            n_correct_chars=n_correct_chars,
-            correct_chars_pct=int(round(100*n_correct_chars/n_chars, 0)),
-            n_words=n_words,
-            n_correct_words=n_correct_words,
-            correct_words_pct=int(round(100*n_correct_words/n_words, 0)),
-        )
+        if " " in _edit.edit_text:
+            # if the user presses space -> only keep what got typed of the current word
+            _edit.set_edit_text(_edit.edit_text.rsplit(" ", 1)[1])
+
+    def on_unhandled_input(key: str) -> None:
+        if key in {"q", "Q"}:
+            raise urwid.ExitMainLoop()
+        if key == "esc":
+            # finish the round early (the only way to finish it in the endless mode)
+            end_round()
 
     # init application loop
-    # NOTE: need to do it before everything else to have access to the screen dimensions
-    loop = urwid.MainLoop(None, PALETTE, unhandled_input=exit_on_q, pop_ups=True)
-    screen_dim = loop.screen.get_cols_rows()
-    word_box_dim = (screen_dim[0] - 4, screen_dim[1])
+    # NOTE: the word box wraps its lines to the width it gets rendered with, no need to know the
+    # screen dimensions up front
+    def type_text(text: str) -> bool:
+        """Type a run of keys into the input field in one go, if that is where they would go."""
+        if word_widget_with_popup._pop_up_widget is not None or top.original_widget.focus is not input_field_box:
+            return False
+        input_field.insert_text(text)
+        return True
+
+    loop = TypingMainLoop(None, PALETTE, screen=screen, unhandled_input=on_unhandled_input, pop_ups=True, type_text=type_text)
 
     # widgets
     ## stats
     stats_widget = get_stats_widget()
     ## word box
-    init_colors = get_colors(init_word_mask(WORDS), (0, -1))
-    word_matrix = get_word_matrix(WORDS, init_colors, word_box_dim)
-    word_widget = urwid.Pile(word_matrix)
+    session = TypingSession(WORDS, keep_keys=keep_keys)
+    word_widget = WordBox(session.state, visible_lines)
 
-    ### augment the word widget Pile with a game over popup
-    urwid.register_signal(urwid.Pile, ["gameover"])
+    ### augment the word widget with a game over popup
     word_widget_with_popup = WidgetWithGameOverPopup(word_widget)
 
     word_box = urwid.LineBox(word_widget_with_popup)
@@ -389,20 +414,108 @@ def main(num_words: int) -> None:
     ## exit button
     button_inst = urwid.Button("Exit")
     ## top level widget
-    top = get_gui(urwid.Filler(urwid.Padding(stats_widget, urwid.CENTER, 25)), word_box, input_field_box, button_inst)
+    stats_table = urwid.Padding(stats_widget, urwid.CENTER, 25)
+    if profiler is not None:
+        ## profiling overlay next to the stats
+        profile_widget = urwid.Text(profiler.overlay_text())
+        stats_table = urwid.Columns([stats_table, (PROFILE_OVERLAY_WIDTH, profile_widget)])
+    top = get_gui(urwid.Filler(stats_table), word_box, input_field_box, button_inst)
     app = urwid.LineBox(top)
 
     # events
-    on_input_change = on_input_change_closure(WORDS, word_box_dim)
+    on_input_change, end_round, current_session, start_next_round, close_round = on_input_change_closure(session)
+    end_round = partial(end_round, word_widget=word_widget, stats_widget=stats_widget)
+    urwid.connect_signal(word_widget_with_popup, "retry", lambda *_: start_next_round(word_widget))
     urwid.connect_signal(input_field, "change", partial(on_input_change, word_widget=word_widget, stats_widget=stats_widget))
     urwid.connect_signal(input_field, "postchange", clear_if_space)
     urwid.connect_signal(button_inst, "click", on_exit_clicked)
 
+    shown_stats = dict(key=None)
+
+    def refresh_stats_widget(loop: urwid.MainLoop, _user_data) -> None:
+        # NOTE: the stats are counters kept up to date by the typing state, reading them is O(1); the
+        # widget still only gets rebuilt on a timer to stay out of the keystroke path
+        session = current_session()
+        if session.start_time is not None:
+            # NOTE: until the first key of a round the last round's stats stay up
+            stats = session.stats()
+            key = (stats["n_correct_chars"], stats["n_chars"], stats["n_correct_words"], stats["n_words"], stats["wpm"])
+            if key != shown_stats["key"]:
+                shown_stats["key"] = key
+                stats_widget.contents = [(get_stats_widget(stats), stats_widget.options())]
+        loop.set_alarm_in(STATS_REFRESH_SECONDS, refresh_stats_widget)
+
+    if race is not None:
+        word_widget.set_opponents(race.cursors)
+
+        def on_race_data() -> None:
+            if race.update_cursors():
+                word_widget.set_opponents(race.cursors)
+            if race.closed:
+                # the server is gone, race on alone
+                loop.remove_watch_file(race_watch)
+                word_widget.set_opponents(dict())
+        race_watch = loop.watch_file(race.fileno(), on_race_data)
+
+        def publish_cursor(loop: urwid.MainLoop, _user_data) -> None:
+            # NOTE: the cursor goes out at most once per tick, however fast the typing
+            race.send_progress(current_session().state.cursor_pos)
+            loop.set_alarm_in(RACE_TICK_SECONDS, publish_cursor)
+        loop.set_alarm_in(RACE_TICK_SECONDS, publish_cursor)
+    loop.set_alarm_in(STATS_REFRESH_SECONDS, refresh_stats_widget)
+
+    if profiler is not None:
+        profiler.instrument(TypingSession, "feed", "engine")
+        profiler.instrument(wordbox.ColorMap, "diff", "colors")
+        profiler.instrument(LineIndex, "wrap_until_line", "wrap")
+        profiler.instrument(LineIndex, "line_of", "wrap")
+        profiler.instrument(word_widget, "_render_line", "line_canvas")
+        profiler.instrument(loop, "process_input", "input")
+        profiler.instrument(loop, "draw_screen", "draw")
+
+        def refresh_profile_widget(loop: urwid.MainLoop, _user_data) -> None:
+            # NOTE: refreshed on a timer rather than on every key to stay out of the keystroke path
+            profile_widget.set_text(profiler.overlay_text())
+            loop.set_alarm_in(PROFILE_REFRESH_SECONDS, refresh_profile_widget)
+        loop.set_alarm_in(PROFILE_REFRESH_SECONDS, refresh_profile_widget)
+
     # set the main widget for the application
     loop.widget = app
 
+    return dict(
+        loop=loop,
+        word_widget=word_widget,
+        word_widget_with_popup=word_widget_with_popup,
+        input_field=input_field,
+        on_exit=on_exit,
+    )
+
+
+def main(
+    num_words: Optional[int],
+    visible_lines: Optional[int] = None,
+    endless: bool = False,
+    corpus: Optional[Corpus] = None,
+    document: Optional[Document] = None,
+    profile_path: Optional[str] = None,
+    record_path: Optional[str] = None,
+    keep_history: bool = True,
+    adaptive: bool = False,
+    race: Optional[RaceClient] = None,
+) -> None:
+    profiler = Profiler() if profile_path is not None else None
+    history = HistoryWriter() if keep_history else None
+    app = build_app(num_words, visible_lines, endless, corpus, document, profiler=profiler, record_path=record_path, history=history, adaptive=adaptive, race=race)
+
     # run application loop
-    loop.run()
+    app["loop"].run()
+    app["on_exit"]()
+    if race is not None:
+        race.close()
+    if history is not None:
+        history.close()
+    if profiler is not None:
+        profiler.dump(profile_path)
 
 
 if __name__ == "__main__":
@@ -411,9 +524,50 @@ if __name__ == "__main__":
         description='Command line typing training',
         epilog='Have fun typing!',
     )
-    parser.add_argument('-n', '--numwords', help="Number of words", required=True, type=int) 
+    parser.add_argument('-n', '--numwords', help="Number of words", type=int) 
+    parser.add_argument('-l', '--lines', help="Number of word box lines to show (0 shows all of them)", default=3, type=int)
+    parser.add_argument('-e', '--endless', help="Keep feeding words until esc is pressed", action='store_true')
+    parser.add_argument('-c', '--corpus', help="Frequency-ranked word list to draw the words from (one word per line, optionally followed by its count)")
+    parser.add_argument('-t', '--text', help="Document to type through, resuming where the last session stopped")
+    parser.add_argument('-p', '--profile', help="Time the keystroke path, show it live and dump it to PROFILE on exit", nargs='?', const="typy_profile.json", metavar="PROFILE")
+    parser.add_argument('-r', '--record', help="Append the keystrokes of every round to RECORD (replay them with keylog.py)", nargs='?', const="typy_keys.log", metavar="RECORD")
+    parser.add_argument('-a', '--adaptive', help="Drill the letters and bigrams that went worst in the recent rounds", action='store_true')
+    parser.add_argument('--race', help="Join the race hosted at ADDRESS (HOST:PORT or unix:PATH, see race.py)", metavar="ADDRESS")
+    parser.add_argument('--name', help="Name to race under", default=os.environ.get("USER", "typist"))
+    parser.add_argument('--no-history', help="Do not store the results in the history (see stats.py)", action='store_true')
     args = parser.parse_args()
-    if args.numwords > 50:
-        import sys
-        sys.exit(f"Number of words can not exceed 50 ({args.numwords} given). Yes, code is slow af.")
-    main(args.numwords)
\ No newline at end of file
+    if args.corpus is not None and not os.path.isfile(args.corpus):
+        parser.error(f"corpus file {args.corpus} does not exist")
+    if args.text is not None and not os.path.isfile(args.text):
+        parser.error(f"text file {args.text} does not exist")
+    if args.corpus is not None and args.text is not None:
+        parser.error("pick either a corpus or a text")
+    if args.adaptive and args.text is not None:
+        parser.error("the adaptive mode picks its own words, it can not be used with a text")
+    if args.race is not None and (args.endless or args.adaptive or args.corpus is not None or args.text is not None):
+        parser.error("the words of a race come from the race server, it can not be combined with -e, -a, -c or -t")
+    if args.numwords is None and not args.endless and args.race is None:
+        parser.error("the number of words (-n) is required unless in the endless or race mode")
+    if args.numwords is not None and args.numwords < 1:
+        parser.error(f"the number of words (-n) should be at least 1 ({args.numwords} given)")
+    if args.endless and args.lines == 0:
+        parser.error("the endless mode can not show all of the lines")
+    corpus = None
+    if args.corpus is not None:
+        try:
+            corpus = Corpus(args.corpus)
+        except (OSError, ValueError) as e:
+            parser.error(f"can not use the corpus: {e}")
+    document = None
+    if args.text is not None:
+        try:
+            document = Document(args.text)
+        except (OSError, ValueError) as e:
+            parser.error(f"can not use the text: {e}")
+    race = None
+    if args.race is not None:
+        try:
+            race = RaceClient(parse_address(args.race), args.name)
+        except (OSError, ValueError, KeyError) as e:
+            parser.error(f"can not join the race at {args.race}: {e}")
+    main(args.numwords, args.lines or None, args.endless, corpus, document, args.profile, args.record, not args.no_history, args.adaptive, race)
\ No newline at end of file
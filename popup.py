@@ -48,9 +48,13 @@ class PopUpDialog(urwid.WidgetWrap):
         exit_button = urwid.Button("Exit")
         urwid.connect_signal(exit_button, "click", on_exit_clicked)
 
+        widgets = [get_stats_widget(stats)]
+        if stats and stats.get("analytics"):
+            # per key analytics of the round (only there if numpy is installed)
+            widgets += [urwid.Divider(), urwid.Text("\n".join(stats["analytics"]))]
         pile = urwid.Pile(
             [
-                get_stats_widget(stats),
+                *widgets,
                 urwid.Columns([retry_button, exit_button]),
             ]
         )
@@ -62,6 +66,9 @@ class WidgetWithGameOverPopup(urwid.PopUpLauncher):
     """TODO
     - find out how to attach a new signal type to a widget (here Pile, signal -- gameover)
     """
+    # emitted once the popup got closed with retry
+    signals: typing.ClassVar[list[str]] = ["retry"]
+
     def __init__(self, widget) -> None:
         super().__init__(widget)
 
@@ -77,11 +84,15 @@ class WidgetWithGameOverPopup(urwid.PopUpLauncher):
 
     def create_pop_up(self) -> PopUpDialog:
         pop_up = PopUpDialog(self.info, self.stats_widget)
-        urwid.connect_signal(pop_up, "close", lambda button: self.close_pop_up())
+        urwid.connect_signal(pop_up, "close", lambda button: self._on_retry())
         centered = urwid.AttrMap(urwid.LineBox(urwid.Filler(urwid.Padding(pop_up, urwid.CENTER, 30))), "popbg")
         # return pop_up
         return centered
 
+    def _on_retry(self) -> None:
+        self.close_pop_up()
+        self._emit("retry")
+
     def get_pop_up_parameters(self):
         return {"left": 0, "top": 1, "overlay_width": 130, "overlay_height": 15}
 
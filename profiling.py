@@ -0,0 +1,84 @@
+"""Hot-path instrumentation for the --profile mode.
+
+Every stage of the keystroke path gets a ring buffer of its most recent timings (for the live
+percentiles) and a power-of-two histogram of all of its timings (for the dump). The stages are timed
+by wrapping the functions in place, so nothing is paid for when profiling is off.
+"""
+import functools
+import json
+import time
+import typing
+from array import array
+
+RING_SIZE = 1024
+# bucket i counts the timings in [2^(i-1), 2^i) microseconds
+NUM_BUCKETS = 32
+
+
+class StageStats:
+    def __init__(self, ring_size: int = RING_SIZE) -> None:
+        self.ring = array("q", [0]*ring_size)
+        self.histogram = array("Q", [0]*NUM_BUCKETS)
+        self.count = 0
+
+    def record(self, ns: int) -> None:
+        self.ring[self.count % len(self.ring)] = ns
+        self.histogram[min((ns >> 10).bit_length(), NUM_BUCKETS - 1)] += 1
+        self.count += 1
+
+    def recent(self) -> list[int]:
+        return sorted(self.ring[:min(self.count, len(self.ring))])
+
+    def summary(self) -> dict:
+        recent = self.recent()
+        if not recent:
+            return dict(count=0)
+        return dict(
+            count=self.count,
+            p50_us=round(recent[len(recent) // 2] / 1e3, 1),
+            p99_us=round(recent[min(len(recent) - 1, len(recent) * 99 // 100)] / 1e3, 1),
+            max_us=round(recent[-1] / 1e3, 1),
+        )
+
+
+class Profiler:
+    def __init__(self) -> None:
+        self.stages = dict()
+
+    def record(self, stage: str, ns: int) -> None:
+        stats = self.stages.get(stage)
+        if stats is None:
+            stats = self.stages[stage] = StageStats()
+        stats.record(ns)
+
+    def instrument(self, owner: typing.Any, name: str, stage: str) -> None:
+        """Replace `owner.name` (a function or method) with a version that times every call."""
+        func = getattr(owner, name)
+        record = self.record
+        clock = time.perf_counter_ns
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(stage, clock() - start)
+        setattr(owner, name, timed)
+
+    def summary(self) -> dict:
+        return {stage: stats.summary() for stage, stats in self.stages.items()}
+
+    def overlay_text(self) -> str:
+        lines = ["stage        p50/p99 us"]
+        for stage, summary in self.summary().items():
+            if summary["count"]:
+                lines.append(f"{stage:<12} {summary['p50_us']:g}/{summary['p99_us']:g}")
+        return "\n".join(lines)
+
+    def dump(self, path: str) -> None:
+        report = dict()
+        for stage, stats in self.stages.items():
+            report[stage] = dict(stats.summary(), histogram_us_pow2=list(stats.histogram))
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
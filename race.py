@@ -0,0 +1,345 @@
+"""Race mode: many typists going through the same words at the same time.
+
+One asyncio server hosts the race over TCP or a unix socket, the messages are newline delimited JSON.
+Clients publish their cursor (at most once per client tick and only if it moved, never the whole
+typing state) and the server fans the cursors out in batched ticks: every TICK_SECONDS the cursors
+that changed since the last tick get encoded once and written to every client without waiting on
+any of them. A client that does not keep up gets dropped rather than slowing down everyone else.
+
+    python race.py serve -n 30             # serves on 127.0.0.1:7777
+    python main.py --race 127.0.0.1:7777
+    python race.py bots -b 300 --serve     # load test on localhost
+"""
+import argparse
+import asyncio
+import json
+import random
+import socket
+import sys
+import time
+import typing
+from itertools import islice
+
+from vocab import VOCAB
+
+DEFAULT_ADDRESS = "127.0.0.1:7777"
+# the server broadcasts the moved cursors this often...
+TICK_SECONDS = 0.05
+# ...and the clients publish their own cursor this often
+CLIENT_TICK_SECONDS = 0.05
+# clients with more than this many bytes waiting to be sent to them get dropped
+MAX_CLIENT_BUFFER = 1 << 20
+
+
+def parse_address(address: str) -> tuple:
+    """"unix:PATH" -> ("unix", PATH); "HOST:PORT" -> ("tcp", HOST, PORT)."""
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return "tcp", host or "127.0.0.1", int(port)
+
+
+def encode(message: dict) -> bytes:
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
+
+
+def is_cursor(cursor) -> bool:
+    """[word, char] with both of them ints."""
+    return isinstance(cursor, list) and len(cursor) == 2 and all(type(i) is int for i in cursor)
+
+
+class RaceServer:
+    def __init__(self, words: list[str], tick: float = TICK_SECONDS) -> None:
+        self.words = words
+        self.tick = tick
+        self.clients = dict()
+        self.cursors = dict()
+        # cursors that moved since the last tick (None: the client left)
+        self.changed = dict()
+        self.n_dropped = 0
+        self._next_id = 1
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        client_id = self._next_id
+        self._next_id += 1
+        try:
+            hello = json.loads(await reader.readline())
+            if not isinstance(hello, dict) or hello.get("type") != "join":
+                return
+            writer.write(encode(dict(type="welcome", id=client_id, words=self.words, cursors=self.cursors)))
+            self.clients[client_id] = writer
+            self.cursors[client_id] = self.changed[client_id] = [0, -1]
+            while line := await reader.readline():
+                message = json.loads(line)
+                if not isinstance(message, dict):
+                    continue
+                if message.get("type") == "progress" and client_id in self.clients:
+                    self.cursors[client_id] = self.changed[client_id] = [int(message["word"]), int(message["char"])]
+        except (ConnectionError, ValueError, KeyError, TypeError):
+            pass
+        finally:
+            self._drop(client_id)
+            writer.close()
+
+    def _drop(self, client_id: int) -> None:
+        if self.clients.pop(client_id, None) is not None:
+            del self.cursors[client_id]
+            self.changed[client_id] = None
+
+    def broadcast_tick(self) -> None:
+        if not self.changed:
+            return
+        data = encode(dict(type="tick", cursors=self.changed))
+        self.changed = dict()
+        for client_id, writer in list(self.clients.items()):
+            if writer.transport.get_write_buffer_size() > MAX_CLIENT_BUFFER:
+                # NOTE: never wait on a single slow client
+                self._drop(client_id)
+                self.n_dropped += 1
+                writer.close()
+                continue
+            writer.write(data)
+
+    async def run_ticks(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            next_tick += self.tick
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+            self.broadcast_tick()
+
+    async def start(self, address: tuple) -> asyncio.AbstractServer:
+        if address[0] == "unix":
+            server = await asyncio.start_unix_server(self.handle, path=address[1])
+        else:
+            server = await asyncio.start_server(self.handle, address[1], address[2])
+        self._ticks = asyncio.get_running_loop().create_task(self.run_ticks())
+        return server
+
+    async def stop(self, server: asyncio.AbstractServer) -> None:
+        """Stop ticking, hang up on the clients and wait for their handlers to finish."""
+        self._ticks.cancel()
+        server.close()
+        for writer in self.clients.values():
+            writer.close()
+        while self.clients:
+            await asyncio.sleep(0.01)
+        await server.wait_closed()
+
+
+class RaceClient:
+    """Blocking connect, non-blocking afterwards: the UI polls it when the socket is readable."""
+    def __init__(self, address: tuple, name: str) -> None:
+        if address[0] == "unix":
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(address[1])
+        else:
+            self.sock = socket.create_connection(address[1:])
+        self.closed = False
+        self._buffer = b""
+        self._last_sent = None
+        self.sock.sendall(encode(dict(type="join", name=name)))
+        while b"\n" not in self._buffer:
+            data = self.sock.recv(1 << 16)
+            if not data:
+                raise ConnectionError("the race server closed the connection")
+            self._buffer += data
+        line, _, self._buffer = self._buffer.partition(b"\n")
+        welcome = json.loads(line)
+        if not isinstance(welcome, dict) or welcome.get("type") != "welcome":
+            raise ValueError("not a race server")
+        self.id = welcome["id"]
+        self.words = [str(word) for word in welcome["words"]]
+        if not self.words:
+            raise ValueError("the race has no words")
+        self.cursors = {int(client_id): tuple(cursor) for client_id, cursor in welcome["cursors"].items() if is_cursor(cursor)}
+        self.sock.setblocking(False)
+
+    def fileno(self) -> int:
+        return self.sock.fileno()
+
+    def read_messages(self) -> list[dict]:
+        messages = list()
+        while True:
+            try:
+                data = self.sock.recv(1 << 16)
+            except BlockingIOError:
+                break
+            except OSError:
+                data = b""
+            if not data:
+                self.closed = True
+                break
+            self._buffer += data
+        *lines, self._buffer = self._buffer.split(b"\n")
+        for line in lines:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            # NOTE: whatever the server sends must not take the UI down
+            if isinstance(message, dict):
+                messages.append(message)
+        return messages
+
+    def update_cursors(self) -> bool:
+        """Apply the ticks that arrived to `cursors` (the opponents only); True if any of them moved."""
+        moved = False
+        for message in self.read_messages():
+            if message.get("type") != "tick" or not isinstance(message.get("cursors"), dict):
+                continue
+            for client_id, cursor in message["cursors"].items():
+                try:
+                    client_id = int(client_id)
+                except ValueError:
+                    continue
+                if client_id == self.id:
+                    continue
+                if cursor is None:
+                    self.cursors.pop(client_id, None)
+                elif is_cursor(cursor):
+                    self.cursors[client_id] = tuple(cursor)
+                else:
+                    continue
+                moved = True
+        return moved
+
+    def send_progress(self, cursor: tuple[int, int]) -> None:
+        if self.closed or cursor == self._last_sent:
+            return
+        try:
+            self.sock.send(encode(dict(type="progress", word=cursor[0], char=cursor[1])))
+        except BlockingIOError:
+            # NOTE: the cursor goes out with the next client tick
+            return
+        except OSError:
+            self.closed = True
+            return
+        self._last_sent = cursor
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+async def run_bot(address: tuple, wpm: float, latencies: list[float], stop: asyncio.Event) -> None:
+    """A simulated typist; records how long its own cursor updates take to come back in a tick."""
+    if address[0] == "unix":
+        reader, writer = await asyncio.open_unix_connection(address[1])
+    else:
+        reader, writer = await asyncio.open_connection(address[1], address[2])
+    writer.write(encode(dict(type="join", name="bot")))
+    welcome = json.loads(await reader.readline())
+    own_id = str(welcome["id"])
+    words = welcome["words"]
+    cursor = [0, -1]
+    sent = dict()
+
+    async def type_and_publish() -> None:
+        key_seconds = 60 / (wpm * 5)
+        last_published = None
+        next_publish = time.monotonic()
+        while not stop.is_set():
+            await asyncio.sleep(key_seconds * random.uniform(0.5, 1.5))
+            cursor[1] += 1
+            if cursor[1] >= len(words[cursor[0]]):
+                cursor[0] = (cursor[0] + 1) % len(words)
+                cursor[1] = -1
+            now = time.monotonic()
+            if now >= next_publish and tuple(cursor) != last_published:
+                last_published = tuple(cursor)
+                sent[last_published] = now
+                writer.write(encode(dict(type="progress", word=cursor[0], char=cursor[1])))
+                next_publish = now + CLIENT_TICK_SECONDS
+
+    async def receive() -> None:
+        while line := await reader.readline():
+            # NOTE: only ticks with our own cursor in them are worth parsing
+            if own_id.encode() not in line:
+                continue
+            cursors = json.loads(line).get("cursors", dict())
+            if cursors.get(own_id) is not None:
+                sent_at = sent.pop(tuple(cursors[own_id]), None)
+                if sent_at is not None:
+                    latencies.append(time.monotonic() - sent_at)
+                if len(sent) > 100:
+                    sent.clear()
+
+    typer = asyncio.create_task(type_and_publish())
+    receiver = asyncio.create_task(receive())
+    await stop.wait()
+    typer.cancel()
+    receiver.cancel()
+    writer.close()
+
+
+async def run_bots(address: tuple, n_bots: int, wpm: float, seconds: float, words: typing.Optional[list[str]]) -> dict:
+    server = None
+    if words is not None:
+        # host the race in this process too
+        server = RaceServer(words)
+        listener = await server.start(address)
+    stop = asyncio.Event()
+    latencies = list()
+    bots = [asyncio.create_task(run_bot(address, wpm, latencies, stop)) for _ in range(n_bots)]
+    await asyncio.sleep(seconds)
+    stop.set()
+    await asyncio.gather(*bots, return_exceptions=True)
+    if server is not None:
+        await server.stop(listener)
+    latencies.sort()
+    report = dict(bots=n_bots, wpm=wpm, seconds=seconds, updates=len(latencies))
+    if latencies:
+        report.update(
+            p50_ms=round(1e3 * latencies[len(latencies) // 2], 1),
+            p99_ms=round(1e3 * latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)], 1),
+            max_ms=round(1e3 * latencies[-1], 1),
+        )
+    if server is not None:
+        report["dropped"] = server.n_dropped
+    return report
+
+
+def race_words(num_words: int, corpus_path: typing.Optional[str]) -> list[str]:
+    if corpus_path is not None:
+        from corpus import Corpus
+        return list(islice(Corpus(corpus_path).words(), num_words))
+    return [random.choice(VOCAB) for _ in range(num_words)]
+
+
+async def serve(address: tuple, words: list[str]) -> None:
+    server = await RaceServer(words).start(address)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog='TyPy race', description='Race server and load test')
+    parser.add_argument('command', choices=["serve", "bots"])
+    parser.add_argument('-a', '--address', help="HOST:PORT or unix:PATH", default=DEFAULT_ADDRESS)
+    parser.add_argument('-n', '--numwords', help="Number of words of the race", default=30, type=int)
+    parser.add_argument('-c', '--corpus', help="Frequency-ranked word list to draw the words from")
+    parser.add_argument('-b', '--bots', help="bots: number of simulated typists", default=100, type=int)
+    parser.add_argument('--wpm', help="bots: typing speed of every bot", default=80, type=float)
+    parser.add_argument('-s', '--seconds', help="bots: how long to run", default=10, type=float)
+    parser.add_argument('--serve', help="bots: host the race in the same process", action='store_true')
+    args = parser.parse_args()
+    try:
+        address = parse_address(args.address)
+    except ValueError:
+        parser.error(f"not an address: {args.address}")
+    if args.numwords < 1:
+        parser.error(f"the number of words (-n) should be at least 1 ({args.numwords} given)")
+    words = None
+    if args.command == "serve" or args.serve:
+        try:
+            words = race_words(args.numwords, args.corpus)
+        except (OSError, ValueError) as e:
+            parser.error(f"can not use the corpus: {e}")
+    if args.command == "serve":
+        print(f"serving the race on {args.address}", file=sys.stderr)
+        try:
+            asyncio.run(serve(address, words))
+        except KeyboardInterrupt:
+            pass
+    else:
+        print(json.dumps(asyncio.run(run_bots(address, args.bots, args.wpm, args.seconds, words)), indent=2))
@@ -0,0 +1,124 @@
+"""Headless typing session.
+
+The game logic (typing state, timer and stats) without any UI: keys go in, state and stats come out.
+The urwid front end in main.py feeds it one key event at a time; batch jobs can feed whole key
+streams at once. Every key gets recorded with its timestamp in the session's KeyLog, which is also
+where the timer reads the start time from.
+"""
+import re
+import time
+import typing
+
+from engine import TypingState
+from keylog import BACKSPACE as BACKSPACE_KEY, SPACE, KeyLog
+
+BACKSPACE = "backspace"
+# runs of plain chars, single spaces and single backspaces ("\b") of a key string
+KEY_RUN_RE = re.compile(r"[^ \x08]+| |\x08")
+
+
+class TypingSession:
+    def __init__(self, words: list[str], clock: typing.Callable[[], int] = time.monotonic_ns, keep_keys: bool = True) -> None:
+        self.state = TypingState(words)
+        # NOTE: timestamps are in ns
+        self.clock = clock
+        # NOTE: the log grows with every key; sessions nobody replays or analyzes can do without it
+        self.log = KeyLog(words, keep_keys)
+
+    @property
+    def start_time(self) -> typing.Optional[int]:
+        # the first typed char starts the timer
+        return self.log.start_time
+
+    @property
+    def end_time(self) -> typing.Optional[int]:
+        return self.log.end_time
+
+    @property
+    def finished(self) -> bool:
+        return self.state.finished or self.end_time is not None
+
+    def _after_space(self, t: int) -> None:
+        if self.state.finished:
+            self.log.end_time = t
+
+    def _next_letters(self, n: int) -> str:
+        """The (up to n) letters the next typed chars get compared against."""
+        state = self.state
+        return state.word(state.word_idx)[state.char_idx + 1:state.char_idx + 1 + n]
+
+    def extend(self, words: list[str]) -> None:
+        """Append words to the end of the text (eg the endless mode)."""
+        self.state.extend(words)
+        if self.log.keep_keys:
+            self.log.words.extend(words)
+
+    def apply(self, key: str) -> None:
+        """Apply a single key event: a char, a space or a backspace (urwid key name or "\\b")."""
+        if self.finished:
+            return
+        t = self.clock()
+        if key == " ":
+            self.state.space()
+            self.log.record(t, SPACE, " ")
+            self._after_space(t)
+        elif key == BACKSPACE or key == "\b":
+            self.state.backspace()
+            self.log.record(t, BACKSPACE_KEY)
+        else:
+            self.log.record_chars(t, key, self._next_letters(1))
+            self.state.type_char(key)
+
+    def feed(self, keys: str) -> dict:
+        """Apply a string of keys ("\\b" is a backspace) and return the stats.
+
+        Runs of plain chars are typed in one go, so a correctly typed word costs about as much as a
+        single key event.
+        """
+        if self.finished:
+            return self.stats()
+        state = self.state
+        log = self.log
+        space, backspace, type_chars = state.space, state.backspace, state.type_chars
+        t = self.clock()
+        for run in KEY_RUN_RE.findall(keys):
+            if run == " ":
+                log.record(t, SPACE, " ")
+                if space():
+                    self._after_space(t)
+                    break
+            elif run == "\b":
+                backspace()
+                log.record(t, BACKSPACE_KEY)
+            else:
+                log.record_chars(t, run, self._next_letters(len(run)))
+                type_chars(run)
+        return self.stats()
+
+    def feed_many(self, events: typing.Iterable[str]) -> dict:
+        """Apply a sequence of key events (see `apply`) and return the stats."""
+        apply = self.apply
+        for key in events:
+            apply(key)
+        return self.stats()
+
+    def stop(self) -> None:
+        """Finish the session early (eg the user gave up or the endless mode ended)."""
+        if self.end_time is None:
+            self.log.end_time = self.clock()
+
+    def elapsed(self) -> float:
+        """Seconds since the first typed char (until the end of the session)."""
+        if self.start_time is None:
+            return 0.0
+        end_time = self.end_time if self.end_time is not None else self.clock()
+        return (end_time - self.start_time) / 1e9
+
+    def stats(self) -> dict:
+        """Chars, words and wpm of the words typed so far."""
+        stats = self.state.stats()
+        elapsed = self.elapsed()
+        stats["wpm"] = int(round(60.0 * stats["n_words"] / elapsed, 0)) if elapsed > 0 else 0
+        stats["finished"] = self.finished
+        stats["cursor_pos"] = self.state.cursor_pos
+        return stats
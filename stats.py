@@ -0,0 +1,55 @@
+"""Stats over the round history (see history.py).
+
+    python stats.py            # wpm trend over the last 1000 rounds and accuracy by word length
+    python stats.py -n 50 -b 5
+"""
+import argparse
+import os
+import sys
+import time
+
+from history import HISTORY_PATH, accuracy_by_word_length, connect, wpm_trend
+
+
+def print_trend(rows: list[tuple], buckets: int) -> None:
+    """Average wpm and accuracy of the rounds split into `buckets` consecutive groups."""
+    print(f"wpm trend over the last {len(rows)} rounds")
+    print(f"{'rounds':<16}{'since':<18}{'wpm':>6}{'acc %':>8}")
+    size = max(1, -(-len(rows) // buckets))
+    for start in range(0, len(rows), size):
+        group = rows[start:start + size]
+        wpm = sum(row[2] for row in group) / len(group)
+        accuracy = sum(row[3] for row in group) / len(group)
+        since = time.strftime("%Y-%m-%d %H:%M", time.localtime(group[0][1]))
+        print(f"{f'#{group[0][0]}-#{group[-1][0]}':<16}{since:<18}{wpm:>6.0f}{accuracy:>8.1f}")
+    if len(rows) > 1:
+        # least squares slope, in wpm per 100 rounds
+        n = len(rows)
+        mean_x = (n - 1) / 2
+        mean_y = sum(row[2] for row in rows) / n
+        slope = sum((i - mean_x) * (row[2] - mean_y) for i, row in enumerate(rows)) / sum((i - mean_x)**2 for i in range(n))
+        print(f"trend: {100 * slope:+.1f} wpm per 100 rounds")
+
+
+def print_word_lengths(rows: list[tuple]) -> None:
+    print("accuracy by word length")
+    print(f"{'length':<8}{'words':>8}{'words %':>10}{'chars %':>10}")
+    for length, n_words, words_pct, chars_pct in rows:
+        print(f"{length:<8}{n_words:>8}{words_pct:>10.1f}{chars_pct:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog='TyPy stats', description='Stats over the history of the played rounds')
+    parser.add_argument('-n', '--rounds', help="Number of most recent rounds to look at", default=1000, type=int)
+    parser.add_argument('-b', '--buckets', help="Number of groups to split the wpm trend into", default=10, type=int)
+    parser.add_argument('--db', help="History database", default=HISTORY_PATH)
+    args = parser.parse_args()
+    if not os.path.isfile(args.db):
+        sys.exit("no history yet, play a round first")
+    connection = connect(args.db)
+    trend = wpm_trend(connection, args.rounds)
+    if not trend:
+        sys.exit("no history yet, play a round first")
+    print_trend(trend, args.buckets)
+    print()
+    print_word_lengths(accuracy_by_word_length(connection, args.rounds))
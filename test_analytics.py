@@ -0,0 +1,52 @@
+import warnings
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from analytics import analyze, summary_lines
+from session import TypingSession
+
+
+def typed_log(words: list[str], keys: list[str], gap_ns: int):
+    now = [0]
+    session = TypingSession(words, clock=lambda: now[0])
+    for key in keys:
+        now[0] += gap_ns
+        session.feed(key)
+    return session.log
+
+
+def test_analyze_even_typing():
+    # 10 times "ab", every other b mistyped, one key every 100ms
+    keys = list()
+    for i in range(10):
+        keys += ["a", "x" if i % 2 else "b", " "]
+    report = analyze([typed_log(["ab"] * 10, keys, 100_000_000)])
+    assert (report["n_sessions"], report["n_keys"]) == (1, 30)
+    assert report["interval_ms"]["p50"] == 100.0
+    assert report["consistency_pct"] == 100.0
+    # 3 keys (2 letters and the space) in 300ms, the first word only had 200ms
+    assert report["burst_wpm"] == dict(p50=120, max=180)
+    assert [(row["key"], row["n"], row["error_pct"], row["latency_ms"]) for row in report["chars"]] == [
+        ("b", 10, 50.0, 100.0),
+        ("a", 10, 0.0, 100.0),
+    ]
+    assert [(row["key"], row["n"], row["error_pct"]) for row in report["bigrams"]] == [("ab", 10, 50.0)]
+    assert any(line.startswith("missed: b 50%") for line in summary_lines(report))
+
+
+def test_analyze_pasted_round():
+    # a paste gets logged with a single timestamp: no rhythm to speak of, but no nan either
+    log = typed_log(["ab", "cd", "ef", "gh", "ij"], ["ab cd ef gh ij "], 1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        report = analyze([log])
+    assert report["consistency_pct"] is None
+    assert report["burst_wpm"] == dict()
+    assert not any(line.startswith(("consistency", "key gap")) for line in summary_lines(report))
+
+
+def test_analyze_without_keys():
+    with pytest.raises(ValueError):
+        analyze([typed_log(["ab"], [], 1)])
@@ -0,0 +1,54 @@
+import random
+from collections import Counter
+from itertools import islice
+
+import pytest
+
+import corpus
+from corpus import Corpus, build_alias_table
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(corpus, "CACHE_DIR", str(tmp_path / "cache"))
+
+
+def write_list(tmp_path, text: str) -> str:
+    path = tmp_path / "words.txt"
+    path.write_text(text)
+    return str(path)
+
+
+def test_alias_table_is_exact():
+    weights = [float(w) for w in random.Random(0).choices(range(1, 100), k=50)] + [0.5, 1e-3]
+    prob, alias = build_alias_table(weights)
+    n = len(weights)
+    # every slot i is drawn with 1/n and then keeps i with prob[i], else gives alias[i]
+    drawn = [prob[i] / n for i in range(n)]
+    for i in range(n):
+        drawn[alias[i]] += (1 - prob[i]) / n
+    total = sum(weights)
+    assert drawn == pytest.approx([w / total for w in weights], abs=1e-12)
+
+
+def test_counted_words_and_the_cached_index(tmp_path):
+    path = write_list(tmp_path, "the 90\nof 9\n\nrare 1\nnever 0\n")
+    words = Corpus(path)
+    assert [words.word(i) for i in range(len(words))] == ["the", "of", "rare"]
+    counts = Counter(islice(words.words(random.Random(0)), 10000))
+    assert counts["the"] > 8 * counts["of"] > 0
+    assert "never" not in counts
+    # the second load reads the index back from the cache
+    again = Corpus(path)
+    assert (list(again.starts), list(again.prob)) == (list(words.starts), list(words.prob))
+
+
+@pytest.mark.parametrize("text", ["", "\n\n", "x 0\ny 0\n"])
+def test_no_words(tmp_path, text):
+    with pytest.raises(ValueError, match="no words"):
+        Corpus(write_list(tmp_path, text))
+
+
+def test_mixed_counts_get_rejected(tmp_path):
+    with pytest.raises(ValueError, match="count"):
+        Corpus(write_list(tmp_path, "a 3\nb\n"))
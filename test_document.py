@@ -0,0 +1,51 @@
+from itertools import islice
+
+import pytest
+
+import document
+from document import Document, load_resume_offset, save_resume_offset
+
+TEXT = "It was the best of times,\nit was  the worst of times.\n"
+
+
+@pytest.fixture
+def text_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(document, "DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setattr(document, "RESUME_PATH", str(tmp_path / "data" / "resume.json"))
+    path = tmp_path / "book.txt"
+    path.write_text(TEXT)
+    return str(path)
+
+
+def test_words_wrap_around_at_the_end(text_path):
+    words = TEXT.split()
+    assert list(islice(Document(text_path).words(), len(words) + 2)) == words + words[:2]
+
+
+def test_skip_words_resumes_after_the_typed_words(text_path):
+    doc = Document(text_path)
+    words = TEXT.split()
+    offset = typed = 0
+    # NOTE: the last round goes past the end of the document
+    for n in (3, 4, 2, 5):
+        offset = doc.skip_words(offset, n)
+        typed += n
+        assert next(doc.words(offset)) == words[typed % len(words)]
+    assert doc.skip_words(offset, 0) == offset
+
+
+def test_resume_offsets_are_kept_per_document(text_path, tmp_path):
+    other = tmp_path / "other.txt"
+    other.write_text("a b c")
+    assert load_resume_offset(text_path) == 0
+    save_resume_offset(text_path, 12)
+    save_resume_offset(str(other), 3)
+    assert (load_resume_offset(text_path), load_resume_offset(str(other))) == (12, 3)
+
+
+@pytest.mark.parametrize("text", ["", " \n\t\n"])
+def test_no_words(tmp_path, text):
+    path = tmp_path / "empty.txt"
+    path.write_text(text)
+    with pytest.raises(ValueError):
+        Document(str(path))
@@ -0,0 +1,65 @@
+import random
+from itertools import islice, repeat
+
+import pytest
+
+import corpus
+import drill
+from drill import ALPHA, Drill, NgramIndex, ngrams, round_scores
+from session import TypingSession
+
+WORDS = ["cat", "dog", "cow", "ant", "owl"]
+
+
+def typed_log(keys: list[tuple[str, int]]):
+    """Keys with the ms since the previous key."""
+    now = [0]
+    session = TypingSession(["cat", "dog"], clock=lambda: now[0])
+    for key, ms in keys:
+        now[0] += ms * 1_000_000
+        session.feed(key)
+    return session.log
+
+
+def test_index_postings():
+    index = NgramIndex.build(WORDS.__getitem__, len(WORDS))
+    for gram in {gram for word in WORDS for gram in ngrams(word)}:
+        containing = {word for word in WORDS if gram in word}
+        assert {index.sample(gram, random.Random(seed)) for seed in range(50)} == containing
+
+
+def test_corpus_index_gets_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(corpus, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(drill, "CACHE_DIR", str(tmp_path))
+    path = tmp_path / "words.txt"
+    path.write_text("\n".join(WORDS))
+    built = NgramIndex.for_corpus(corpus.Corpus(str(path)))
+    loaded = NgramIndex(built.word, built.num_words)
+    assert loaded._load(str(next(tmp_path.glob("*.ngrams"))), (path.stat().st_size, path.stat().st_mtime_ns, len(WORDS)))
+    assert (loaded.grams, loaded.starts, loaded.postings) == (built.grams, built.starts, built.postings)
+
+
+def test_round_scores():
+    # "cat" right at an even pace, the o of "dog" missed and the g slow
+    scores = round_scores(typed_log([("c", 0), ("a", 100), ("t", 100), (" ", 100), ("d", 100), ("x", 100), ("g", 300), (" ", 100)]))
+    assert scores["c"] == scores["a"] == 0.0
+    assert scores["o"] == 1.0
+    assert scores["g"] > 0 and scores["og"] > 0
+    assert scores["a"] < scores["g"] < scores["o"]
+
+
+def test_update_and_focus():
+    index = NgramIndex.build(WORDS.__getitem__, len(WORDS))
+    # NOTE: the base words never contain a w
+    practice = Drill(index, repeat("cat"), dict(w=0.0, zz=5.0))
+    log = typed_log([("c", 0), ("a", 100), ("t", 100), (" ", 100), ("d", 100), ("x", 100), ("g", 100), (" ", 100)])
+    practice.update(log)
+    assert practice.weights["o"] == pytest.approx(ALPHA)
+    assert practice.weights["c"] == 0.0
+    # letters/bigrams the index does not know never get drilled
+    assert "zz" not in practice._grams
+    words = list(islice(practice.words(random.Random(0)), 1000))
+    focused = sum(word != "cat" for word in words)
+    # everything drilled contains an o (o and do went wrong), about FOCUS_SHARE of the words
+    assert all("o" in word for word in words if word != "cat")
+    assert 0.5 < focused / len(words) < 0.7
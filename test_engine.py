@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from engine import CORRECT, TypingState
+from session import TypingSession
+
+
+def recount(state: TypingState) -> dict:
+    """The stats of the completed words, counted from the status buffer."""
+    counts = dict(n_chars=0, n_correct_chars=0, n_words=0, n_correct_words=0)
+    for word_idx in range(state.first_word, state.word_idx):
+        status = state.word_status(word_idx)
+        n_correct = status.count(CORRECT)
+        counts["n_chars"] += len(status)
+        counts["n_correct_chars"] += n_correct
+        counts["n_words"] += 1
+        counts["n_correct_words"] += n_correct == len(status)
+    return counts
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_counters_match_recount(seed, random_words, random_keys):
+    rng = random.Random(seed)
+    words = random_words(rng, 30)
+    session = TypingSession(words, clock=lambda: 0)
+    for key in random_keys(rng, words, 400):
+        session.feed(key)
+        assert session.state.counts == recount(session.state)
+    length_counts = dict()
+    for word_idx in range(session.state.word_idx):
+        status = session.state.word_status(word_idx)
+        counts = length_counts.setdefault(len(status), [0, 0, 0])
+        counts[0] += 1
+        counts[1] += status.count(CORRECT) == len(status)
+        counts[2] += status.count(CORRECT)
+    assert session.state.length_counts == length_counts
+
+
+def test_retired_words_stay_counted(random_words, random_keys):
+    rng = random.Random(0)
+    words = random_words(rng, 40)
+    keys = random_keys(rng, words, 300)
+    retired = TypingSession(words, clock=lambda: 0)
+    kept = TypingSession(words, clock=lambda: 0)
+    for key in keys:
+        retired.feed(key)
+        kept.feed(key)
+        if retired.state.word_idx - retired.state.first_word > 5:
+            retired.state.retire(retired.state.word_idx - 2)
+    assert retired.state.first_word > 0
+    assert retired.stats() == kept.stats()
+    for word_idx in range(retired.state.first_word, len(words)):
+        assert retired.state.word(word_idx) == kept.state.word(word_idx)
+        assert retired.state.word_status(word_idx) == kept.state.word_status(word_idx)
@@ -0,0 +1,40 @@
+import pytest
+
+from history import HistoryWriter, accuracy_by_word_length, connect, round_record, wpm_trend, write_rounds
+from session import TypingSession
+
+
+def played_round(keys: str, seconds: int) -> dict:
+    now = [0]
+    session = TypingSession(["ab", "cde", "fg"], clock=lambda: now[0])
+    session.feed(keys[0])
+    now[0] = seconds * 1_000_000_000
+    session.feed(keys[1:])
+    session.stop()
+    return round_record(session, "words")
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "history.sqlite")
+
+
+def test_queries_over_written_rounds(db_path):
+    connection = connect(db_path)
+    # all right in 12s (15 wpm), then 4 of 7 letters right in 6s (30 wpm)
+    write_rounds(connection, [played_round("ab cde fg ", 12), played_round("ab cxx fx ", 6)])
+    trend = wpm_trend(connection, 10)
+    assert [(row[0], row[2]) for row in trend] == [(1, 15), (2, 30)]
+    assert [round(row[3]) for row in trend] == [100, 57]
+    assert accuracy_by_word_length(connection) == [(2, 4, 75.0, 87.5), (3, 2, 50.0, pytest.approx(400 / 6))]
+    # only the last round
+    assert [row[0] for row in wpm_trend(connection, 1)] == [2]
+    assert accuracy_by_word_length(connection, 1) == [(2, 2, 50.0, 75.0), (3, 1, 0.0, pytest.approx(100 / 3))]
+
+
+def test_writer_stores_everything_on_close(db_path):
+    writer = HistoryWriter(db_path)
+    for _ in range(5):
+        writer.submit(played_round("ab cde fg ", 12))
+    writer.close()
+    assert len(wpm_trend(connect(db_path), 100)) == 5
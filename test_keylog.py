@@ -0,0 +1,62 @@
+import io
+import random
+
+from keylog import KeyLog, append_log, load_logs, replay
+from session import TypingSession
+
+
+def typed_session(rng: random.Random, words: list[str], keys: str) -> TypingSession:
+    now = [1_000_000]
+
+    def clock():
+        now[0] += rng.randint(50_000_000, 300_000_000)
+        return now[0]
+
+    session = TypingSession(words, clock=clock)
+    for key in keys:
+        session.feed(key)
+    session.stop()
+    return session
+
+
+def test_key_log_round_trip_and_replay(random_words, random_keys):
+    rng = random.Random(0)
+    words = random_words(rng, 20)
+    session = typed_session(rng, words, random_keys(rng, words, 150))
+    f = io.BytesIO()
+    session.log.write(f)
+    session.log.write(f)
+    f.seek(0)
+    logs = [KeyLog.read(f), KeyLog.read(f)]
+    assert KeyLog.read(f) is None
+    for log in logs:
+        assert log.words == words
+        for name in ("times", "kinds", "chars", "expected", "status"):
+            assert getattr(log, name) == getattr(session.log, name)
+        assert (log.start_time, log.end_time) == (session.start_time, session.end_time)
+        replayed = replay(log)
+        assert replayed.state.status == session.state.status
+        assert replayed.stats() == session.stats()
+
+
+def test_append_and_load(tmp_path, random_words, random_keys):
+    rng = random.Random(1)
+    path = str(tmp_path / "keys.log")
+    sessions = list()
+    for _ in range(3):
+        words = random_words(rng, 10)
+        sessions.append(typed_session(rng, words, random_keys(rng, words, 80)))
+        append_log(path, sessions[-1].log)
+    logs = load_logs(path)
+    assert [log.words for log in logs] == [session.log.words for session in sessions]
+    assert [replay(log).stats() for log in logs] == [session.stats() for session in sessions]
+
+
+def test_without_keys_only_the_timer_is_kept():
+    now = [7]
+    session = TypingSession(["ab", "cd"], clock=lambda: now[0], keep_keys=False)
+    session.feed("ab c")
+    session.extend(["ef"])
+    assert (len(session.log), session.log.words) == (0, [])
+    assert session.start_time == 7
+    assert session.stats()["n_words"] == 1
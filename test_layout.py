@@ -0,0 +1,40 @@
+import random
+
+import pytest
+
+from engine import TypingState
+from layout import LineIndex
+
+
+@pytest.mark.parametrize("width", [5, 9, 16, 80])
+def test_line_index_matches_greedy_wrap(width, random_words):
+    words = random_words(random.Random(width), 200)
+    lines = [[words[0]]]
+    for word in words[1:]:
+        if len(" ".join(lines[-1] + [word])) > width:
+            lines.append([word])
+        else:
+            lines[-1].append(word)
+    index = LineIndex(TypingState(words), width)
+    index.wrap_until_line(len(words))
+    assert [[words[i] for i in index.line_words(line)] for line in range(index.num_lines)] == lines
+    word_idx = 0
+    for line, line_words in enumerate(lines):
+        column = 0
+        for word in line_words:
+            assert index.line_of(word_idx) == line
+            assert index.column_of(word_idx) == column
+            column += len(word) + 1
+            word_idx += 1
+
+
+def test_resize_rewraps_from_the_anchor(random_words):
+    words = random_words(random.Random(0), 100)
+    index = LineIndex(TypingState(words), 20)
+    index.wrap_until_line(10)
+    anchor = index.line_starts[3]
+    index.resize(11, anchor)
+    fresh = LineIndex(TypingState(words[anchor:]), 11)
+    fresh.wrap_until_line(len(words))
+    index.wrap_until_line(len(words))
+    assert [start - anchor for start in index.line_starts] == list(fresh.line_starts)
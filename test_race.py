@@ -0,0 +1,99 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from race import RaceClient, RaceServer, encode, run_bots
+
+WORDS = ["alpha", "beta", "gamma"]
+
+
+@pytest.fixture
+def race_address(tmp_path):
+    """A race server on a unix socket, run by an event loop in a background thread."""
+    address = ("unix", str(tmp_path / "race.sock"))
+    server = RaceServer(WORDS, tick=0.01)
+    loop = asyncio.new_event_loop()
+    listener = loop.run_until_complete(server.start(address))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield address
+    asyncio.run_coroutine_threadsafe(server.stop(listener), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    loop.close()
+
+
+def wait_for(condition, seconds: float = 5.0) -> bool:
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def test_cursors_go_round_trip(race_address):
+    alice = RaceClient(race_address, "alice")
+    bob = RaceClient(race_address, "bob")
+    assert alice.words == bob.words == WORDS
+    assert alice.id != bob.id
+    alice.send_progress((1, 2))
+    assert wait_for(lambda: bob.update_cursors() and bob.cursors.get(alice.id) == (1, 2))
+    # the own cursor never shows up among the opponents
+    assert wait_for(lambda: alice.update_cursors() or bob.id in alice.cursors)
+    assert alice.id not in alice.cursors
+    alice.close()
+    assert wait_for(lambda: bob.update_cursors() and alice.id not in bob.cursors)
+    bob.close()
+
+
+def test_bad_clients_do_not_break_the_race(race_address):
+    bad = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    bad.connect(race_address[1])
+    bad.sendall(b"[1]\n")
+    rude = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    rude.connect(race_address[1])
+    rude.sendall(encode(dict(type="join")) + b"not json\n")
+    alice = RaceClient(race_address, "alice")
+    bob = RaceClient(race_address, "bob")
+    alice.send_progress((2, 0))
+    assert wait_for(lambda: bob.update_cursors() and bob.cursors.get(alice.id) == (2, 0))
+    for sock in (bad, rude, alice, bob):
+        sock.close()
+
+
+def test_client_skips_malformed_messages():
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+
+    def serve():
+        conn, _ = listener.accept()
+        conn.recv(1 << 10)
+        conn.sendall(encode(dict(type="welcome", id=1, words=WORDS, cursors={"2": [0, 0], "3": "x"})))
+        conn.sendall(
+            b"not json\n[1]\n" + encode(dict(type="tick", cursors=[1]))
+            + encode(dict(type="tick", cursors={"x": [1, 1], "4": [1, "a"], "5": [1, 2, 3], "6": [0, 1], "2": None}))
+        )
+        conn.close()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    client = RaceClient(("tcp", "127.0.0.1", listener.getsockname()[1]), "me")
+    assert client.cursors == {2: (0, 0)}
+    thread.join(5)
+    assert wait_for(lambda: client.update_cursors() or client.closed)
+    client.update_cursors()
+    assert client.cursors == {6: (0, 1)}
+    client.close()
+    listener.close()
+
+
+def test_bots_on_localhost(tmp_path):
+    report = asyncio.run(run_bots(("unix", str(tmp_path / "bots.sock")), 10, 600, 0.5, WORDS))
+    assert report["updates"] > 0 and report["dropped"] == 0
+    assert json.loads(json.dumps(report)) == report
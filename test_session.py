@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+from session import BACKSPACE, TypingSession
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_feed_matches_key_by_key(seed, random_words, random_keys):
+    rng = random.Random(seed)
+    words = random_words(rng, 30)
+    keys = random_keys(rng, words, 400)
+    fed = TypingSession(words, clock=lambda: 0)
+    # NOTE: feed in random chunks, the way bursts and pastes come in
+    i = 0
+    while i < len(keys):
+        n = rng.randint(1, 8)
+        fed.feed(keys[i:i + n])
+        i += n
+    one_by_one = TypingSession(words, clock=lambda: 0)
+    one_by_one.feed_many(BACKSPACE if key == "\b" else key for key in keys)
+    assert fed.state.status == one_by_one.state.status
+    assert fed.state.cursor_pos == one_by_one.state.cursor_pos
+    assert fed.stats() == one_by_one.stats()
+    assert list(fed.log.kinds) == list(one_by_one.log.kinds)
+    assert list(fed.log.status) == list(one_by_one.log.status)
+
+
+def test_timer_and_wpm():
+    now = [0]
+    session = TypingSession(["hello", "world"], clock=lambda: now[0])
+    session.feed(" ")
+    assert session.start_time is None
+    now[0] = 5_000_000_000
+    session.feed("hello ")
+    now[0] = 35_000_000_000
+    stats = session.feed("world ")
+    # 2 words in the 30 seconds since the first typed char
+    assert (session.start_time, session.end_time) == (5_000_000_000, 35_000_000_000)
+    assert (stats["wpm"], stats["finished"], stats["n_correct_words"]) == (4, True, 2)
+    # keys after the end do nothing
+    now[0] = 99_000_000_000
+    assert session.feed("more") == stats
+
+
+def test_stop_ends_the_session_early():
+    now = [0]
+    session = TypingSession(["one", "two", "three"], clock=lambda: now[0])
+    session.feed("one tw")
+    now[0] = 60_000_000_000
+    session.stop()
+    stats = session.feed("o ")
+    assert stats["finished"] and session.elapsed() == 60.0
+    assert (stats["n_words"], stats["cursor_pos"]) == (1, (1, 1))
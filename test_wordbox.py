@@ -0,0 +1,28 @@
+import random
+
+import pytest
+
+from session import TypingSession
+from wordbox import WordBox
+
+
+def screen_of(word_box: WordBox, width: int) -> list:
+    return list(word_box.render((width,)).content())
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_patched_word_box_matches_fresh_render(seed, random_words, random_keys):
+    rng = random.Random(seed)
+    width = rng.randint(12, 40)
+    words = random_words(rng, 60)
+    session = TypingSession(words, clock=lambda: 0)
+    word_box = WordBox(session.state, 3)
+    screen_of(word_box, width)
+    keys = random_keys(rng, words, 300)
+    i = 0
+    while i < len(keys) and not session.finished:
+        n = rng.randint(1, 4)
+        session.feed(keys[i:i + n])
+        i += n
+        word_box.apply_diff(word_box.color_map.diff())
+        assert screen_of(word_box, width) == screen_of(WordBox(session.state, 3), width)
@@ -0,0 +1,8 @@
+"""The built-in word list (used when no corpus or document is given)."""
+
+VOCAB = [
+    "few", "public", "little", "who", "under", "some", "first", "see", "just", "interest",
+    "down", "after", "both", "take", "no", "use", "own", "however", "stand", "system", "you",
+    "find", "small", "same", "and", "get", "by", "run", "group", "where", "old", "fact", "he",
+    "we", "over", "high", "people", "end", "while", "also", "help", "form", "do",
+]
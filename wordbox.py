@@ -0,0 +1,258 @@
+"""Word box widget.
+
+The word box renders the text straight from the typing state into a canvas, one text row per wrapped
+line. The cells (letters and their LetterStatus) and the canvas of every visible line are cached; a
+key event produces a small diff of changed letters (see ColorMap) that gets patched into the cells
+of the affected line(s) only. Opponent cursors (race mode) get laid over the cells when a line's
+canvas is built.
+"""
+import urwid
+from enum import Enum
+from typing import Optional
+from urwid.util import apply_target_encoding, rle_append_modify
+
+from engine import TypingState, UNTYPED, CORRECT
+from layout import LineIndex
+
+
+class LetterStatus(Enum):
+    CORRECT = "correct"
+    WRONG = "wrong"
+    DEFAULT = "default"
+    CURRENT_LETTER = "current_letter"
+    CORRECT_CURRENT_WORD = "correct_current_word"
+    WRONG_CURRENT_WORD = "wrong_current_word"
+    DEFAULT_CURRENT_WORD = "default_current_word"
+    OPPONENT = "opponent"
+
+
+def _map_status_to_color(status: int, current_word: bool) -> LetterStatus:
+    if current_word:
+        if status == UNTYPED:
+            return LetterStatus.DEFAULT_CURRENT_WORD
+        elif status == CORRECT:
+            return LetterStatus.CORRECT_CURRENT_WORD
+        else:
+            return LetterStatus.WRONG_CURRENT_WORD
+    else:
+        if status == UNTYPED:
+            return LetterStatus.DEFAULT
+        elif status == CORRECT:
+            return LetterStatus.CORRECT
+        else:
+            return LetterStatus.WRONG
+
+
+def get_word_colors(state: TypingState, word_idx: int, current_word: Optional[bool] = None) -> list[LetterStatus]:
+    if current_word is None:
+        current_word = not state.finished and word_idx == state.word_idx
+    colors = [_map_status_to_color(s, current_word) for s in state.word_status(word_idx)]
+    if current_word and state.char_idx < len(colors) - 1:
+        colors[state.char_idx+1] = LetterStatus.CURRENT_LETTER
+    return colors
+
+
+class ColorMap:
+    """LetterStatus of the letters, maintained incrementally.
+
+    A key event can only change the current word and the word(s) the cursor just left, so only the
+    colors of the current word are kept around to diff against.
+    """
+    def __init__(self, state: TypingState) -> None:
+        self.state = state
+        self._word_idx = state.word_idx
+        self._colors = get_word_colors(state, state.word_idx)
+
+    def diff(self) -> list[tuple[int, int, LetterStatus]]:
+        """(word, letter, status) of the letters whose status changed since the last diff."""
+        state = self.state
+        changes = list()
+        word_idx = state.word_idx if not state.finished else state.num_words
+        if word_idx != self._word_idx:
+            # the cursor left the word -> it is drawn with the not current word colors from now on
+            if self._word_idx >= state.first_word:
+                new_colors = get_word_colors(state, self._word_idx, current_word=False)
+                changes += [(self._word_idx, i, c) for i, (o, c) in enumerate(zip(self._colors, new_colors)) if o != c]
+            # a burst of keys can get through whole words at once -> those were still untyped
+            for skipped in range(max(self._word_idx + 1, state.first_word), min(word_idx, state.num_words)):
+                changes += [(skipped, i, c) for i, c in enumerate(get_word_colors(state, skipped, current_word=False)) if c != LetterStatus.DEFAULT]
+            old_colors = get_word_colors(state, word_idx, current_word=False) if word_idx < state.num_words else list()
+        else:
+            old_colors = self._colors
+        new_colors = get_word_colors(state, word_idx) if word_idx < state.num_words else list()
+        changes += [(word_idx, i, c) for i, (o, c) in enumerate(zip(old_colors, new_colors)) if o != c]
+        self._word_idx = word_idx
+        self._colors = new_colors
+        return changes
+
+
+class WordBox(urwid.Widget):
+    """Word box showing a window of `visible_lines` lines around the cursor (all lines if None).
+
+    Line breaks come from a lazily built LineIndex, only as far as the window needs them, so the size
+    of the text does not matter as long as the window stays the same.
+    """
+    _sizing = frozenset([urwid.Sizing.FLOW])
+    signals = ["gameover"]
+
+    def __init__(self, state: TypingState, visible_lines: Optional[int] = None) -> None:
+        super().__init__()
+        self.visible_lines = visible_lines
+        # race mode: opponent id -> (word, char) cursor
+        self.opponents = dict()
+        self.set_state(state)
+
+    def set_state(self, state: TypingState) -> None:
+        """Switch to a new text; the layout gets computed on the next render."""
+        self.state = state
+        self._index = None
+        self._top = 0
+        self.color_map = ColorMap(state)
+        # per line: the encoded letter and the LetterStatus of every column
+        self._line_cells = dict()
+        self._line_cache = dict()
+        self._invalidate()
+
+    def prepare(self, state: TypingState) -> "WordBox":
+        """A word box for `state` laid out and rendered off screen at the current width (see swap_in)."""
+        ready = WordBox(state, self.visible_lines)
+        if self._index is not None:
+            ready.render((self._index.width,))
+        return ready
+
+    def swap_in(self, ready: "WordBox") -> None:
+        """Take over the text, layout and rendered lines of a prepared word box in one go."""
+        self.state, self._index, self._top, self.color_map = ready.state, ready._index, ready._top, ready.color_map
+        self._line_cells = ready._line_cells
+        # NOTE: the prepared lines were rendered without the opponents
+        self._line_cache = ready._line_cache if not self.opponents else dict()
+        self._invalidate()
+
+    def _visible_range(self, maxcol: int) -> range:
+        if self._index is None:
+            self._index = LineIndex(self.state, maxcol)
+        elif maxcol != self._index.width:
+            # the terminal got resized -> re-wrap starting from the top line of the window
+            self._index.resize(maxcol, self._index.line_starts[self._top])
+            self._line_cells = dict()
+            self._line_cache = dict()
+        if self.visible_lines is None:
+            self._index.wrap_until_line(self.state.num_words)
+            return range(self._index.num_lines)
+        cursor_line = self._index.line_of(min(self.state.word_idx, self.state.num_words - 1))
+        # keep one already typed line above the cursor line
+        self._top = max(0, cursor_line - 1)
+        self._index.wrap_until_line(self._top + self.visible_lines - 1)
+        return range(self._top, min(self._top + self.visible_lines, self._index.num_lines))
+
+    def _line_cells_of(self, line_idx: int, maxcol: int) -> tuple[list[bytes], list]:
+        cells = self._line_cells.get(line_idx)
+        if cells is not None:
+            return cells
+        letters = list()
+        colors = list()
+        for word_idx in self._index.line_words(line_idx):
+            if letters:
+                # space between words
+                letters.append(b" ")
+                colors.append(None)
+            for color, letter in zip(get_word_colors(self.state, word_idx), self.state.word(word_idx)):
+                encoded, _ = apply_target_encoding(letter)
+                letters.append(encoded)
+                colors.append(color)
+        # NOTE: a word longer than the line gets clipped
+        del letters[maxcol:], colors[maxcol:]
+        cells = self._line_cells[line_idx] = (letters, colors)
+        return cells
+
+    def _render_line(self, line_idx: int, maxcol: int) -> urwid.TextCanvas:
+        canvas = self._line_cache.get(line_idx)
+        if canvas is not None:
+            return canvas
+        letters, colors = self._line_cells_of(line_idx, maxcol)
+        opponent_cols = self._opponent_columns(line_idx, len(letters))
+        if opponent_cols:
+            colors = list(colors)
+            for col in opponent_cols:
+                colors[col] = LetterStatus.OPPONENT
+        attr = list()
+        for encoded, color in zip(letters, colors):
+            rle_append_modify(attr, (color, len(encoded)))
+        text = b"".join(letters)
+        if len(letters) < maxcol:
+            rle_append_modify(attr, (None, maxcol - len(letters)))
+            text += b" "*(maxcol - len(letters))
+        canvas = urwid.TextCanvas([text], [attr], maxcol=maxcol)
+        self._line_cache[line_idx] = canvas
+        return canvas
+
+    def _opponent_column(self, cursor: tuple[int, int]) -> Optional[tuple[int, int]]:
+        """(line, column) of the letter an opponent is about to type, if it is laid out."""
+        word_idx, char_idx = cursor
+        index = self._index
+        if index is None or not index.first_word <= word_idx < min(index.wrapped, self.state.num_words):
+            return None
+        letter_idx = min(char_idx + 1, len(self.state.word(word_idx)) - 1)
+        return index.line_of(word_idx), index.column_of(word_idx) + letter_idx
+
+    def _opponent_columns(self, line_idx: int, width: int) -> list[int]:
+        columns = list()
+        for cursor in self.opponents.values():
+            position = self._opponent_column(cursor)
+            if position is not None and position[0] == line_idx and position[1] < width:
+                columns.append(position[1])
+        return columns
+
+    def set_opponents(self, opponents: dict) -> None:
+        """Move the opponent cursors (id -> (word, char)); only the lines they leave/enter get redrawn."""
+        for key in set(self.opponents) | set(opponents):
+            old, new = self.opponents.get(key), opponents.get(key)
+            if old == new:
+                continue
+            for cursor in (old, new):
+                position = self._opponent_column(cursor) if cursor is not None else None
+                if position is not None:
+                    self._line_cache.pop(position[0], None)
+        self.opponents = dict(opponents)
+        self._invalidate()
+
+    def rows(self, size: tuple[int], focus: bool = False) -> int:
+        maxcol, = size
+        return len(self._visible_range(maxcol))
+
+    def render(self, size: tuple[int], focus: bool = False) -> urwid.Canvas:
+        maxcol, = size
+        visible = self._visible_range(maxcol)
+        # NOTE: only the lines in the window are worth keeping around
+        self._line_cells = {i: c for i, c in self._line_cells.items() if i in visible}
+        self._line_cache = {i: c for i, c in self._line_cache.items() if i in visible}
+        return urwid.CanvasCombine([(self._render_line(i, maxcol), None, False) for i in visible])
+
+    def retire_typed_words(self) -> None:
+        """Drop the words above the window from the typing state, only their stats are kept."""
+        if self._index is None or self.visible_lines is None:
+            return
+        anchor = self._index.line_starts[self._top]
+        self.state.retire(anchor)
+        self._index.resize(self._index.width, anchor)
+        self._line_cells = dict()
+        self._line_cache = dict()
+        self._invalidate()
+
+    def apply_diff(self, diff: list[tuple[int, int, LetterStatus]]) -> None:
+        """Patch the changed letters (see ColorMap.diff) into the cached lines holding them."""
+        if self._index is None:
+            return
+        for word_idx, letter_idx, color in diff:
+            if not self._index.first_word <= word_idx < self._index.wrapped:
+                continue
+            line_idx = self._index.line_of(word_idx)
+            cells = self._line_cells.get(line_idx)
+            if cells is None:
+                # not rendered yet -> it gets built from the typing state anyway
+                continue
+            col = self._index.column_of(word_idx) + letter_idx
+            if col < len(cells[1]):
+                cells[1][col] = color
+                self._line_cache.pop(line_idx, None)
+        self._invalidate()